@@ -0,0 +1,53 @@
+from mark import build, serve
+import argparse
+import sys
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m mark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_command = commands.add_parser("build", help="compile a directory of markdown")
+    build_command.add_argument("src", help="directory of .md files")
+    build_command.add_argument("dst", help="directory the .html files are written to")
+    build_command.add_argument("--prettify", action="store_true")
+    build_command.add_argument("--base-indent", type=int, default=0)
+    build_command.add_argument("--highlight", action="store_true",
+                               help="highlight python, shell, json and c-like code blocks")
+    build_command.add_argument("-j", "--jobs", type=int, default=None,
+                               help="worker processes (default: one per core)")
+    build_command.add_argument("--gzip", action="store_true",
+                               help="also write every page gzipped, as .html.gz")
+    build_command.add_argument("--deflate", action="store_true",
+                               help="also write every page zlib deflated, as .html.zz")
+    build_command.add_argument("--level", type=int, default=6, choices=range(1, 10), metavar="1-9",
+                               help="compression level (default: 6)")
+    build_command.set_defaults(run=build.main)
+
+    serve_command = commands.add_parser("serve", help="compile markdown sent over HTTP")
+    serve_command.add_argument("--host", default="127.0.0.1")
+    serve_command.add_argument("--port", type=int, default=8000)
+    serve_command.add_argument("--unix", default=None, metavar="PATH",
+                               help="listen on a Unix socket instead of host:port")
+    serve_command.add_argument("--prettify", action="store_true")
+    serve_command.add_argument("--base-indent", type=int, default=0)
+    serve_command.add_argument("--highlight", action="store_true",
+                               help="highlight python, shell, json and c-like code blocks")
+    serve_command.add_argument("-j", "--workers", type=int, default=None,
+                               help="documents compiled at once in the pool (default: one per core)")
+    serve_command.add_argument("--threads", action="store_true",
+                               help="compile in a thread pool instead of worker processes")
+    serve_command.add_argument("--queue", type=int, default=64,
+                               help="documents that can wait for the pool before requests are turned away")
+    serve_command.add_argument("--timeout", type=float, default=10.0,
+                               help="seconds a request has to be answered in")
+    serve_command.add_argument("--inline-bytes", type=int, default=8192,
+                               help="documents up to this size are compiled without the pool")
+    serve_command.add_argument("--max-bytes", type=int, default=None,
+                               help="largest document accepted (default: limits.untrusted)")
+    serve_command.set_defaults(run=serve.main)
+
+    args = parser.parse_args()
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
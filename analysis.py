@@ -0,0 +1,118 @@
+from mark.lexer import Lexer, BACKTICK, NEWLINE
+from mark.parser import (Parser, Cursor, CodeBlock, TEXT, HEADER, LINK, REFERENCE,
+                         IMAGE, CODEBLOCK)
+from mark.output_generation import url_builder
+from mark.limits import no_limits
+from mark.incremental import cut_blocks
+import re
+
+# What a document has in it, in the order it appears:
+#   headings:  (level, text) of every header, the text is what the html shows
+#              without the whitespace around it
+#   links:     the href of every link and reference, as it is in the html
+#   images:    (path, alt) of every image
+#   languages: the language of every code block, None if it has none
+class Metadata:
+    def __init__(self):
+        self.headings = []
+        self.links = []
+        self.images = []
+        self.languages = []
+
+# Parses a document for extract a block at a time, without keeping it around.
+# Code blocks are skipped over instead of having their code read.
+class _MetadataParser(Parser):
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.cursor = Cursor(tokens)
+        self._limit(no_limits, None)
+        self.should_debug = False
+
+    def _parse_codeblock(self) -> CodeBlock:
+        cursor = self.cursor
+        cursor.skip(3)
+        lang = self._parse_inline(NEWLINE)
+        node = CodeBlock(None if len(lang) == 0 else lang[0].value)
+
+        while cursor.current().kind != BACKTICK:
+            cursor.skip()
+        cursor.skip(2) # Skipping the 2 ``
+        return node
+
+# Headers, links, references, images and code blocks all start with one of
+# these, and so does everything (emphasis, monospace) that can carry on past
+# the end of its block. Blocks without them are never parsed.
+_markup = re.compile(r"[#\[<*`]")
+
+# Collects the metadata of @source without generating any html. Only the runs
+# of blocks that can have metadata in them are lexed and parsed, each on its
+# own. If a run doesn't parse on its own (it carries on into the blocks after
+# it), the rest of the document is parsed in one go like Compiler would, and
+# raises what it would. Errors in blocks that are never parsed aren't raised.
+def extract(source: str) -> Metadata:
+    metadata = Metadata()
+    # Every blank line outside of a code block is a cut
+    spans = cut_blocks(source)
+    i = 0
+    while i < len(spans):
+        start, end = spans[i]
+        if _markup.search(source, start, end) is None:
+            i += 1
+            continue
+        while i + 1 < len(spans) and _markup.search(source, *spans[i + 1]) is not None:
+            i += 1
+        end = spans[i][1]
+        i += 1
+
+        try:
+            blocks = _parse(source[start:end])
+        except Exception:
+            blocks = _parse(source[start:])
+            i = len(spans)
+        for block in blocks:
+            _collect(block, metadata)
+    return metadata
+
+def _parse(source: str) -> list:
+    parser = _MetadataParser(Lexer(source, False).tokens)
+    return parser._parse()
+
+# The same for a document that's already parsed (Parser.document) or loaded
+# (serialize.loads)
+def extract_document(document: list) -> Metadata:
+    metadata = Metadata()
+    for block in document:
+        _collect(block, metadata)
+    return metadata
+
+def _collect(block, metadata: Metadata) -> None:
+    stack = [block]
+    while stack:
+        node = stack.pop()
+        kind = node.kind
+        if kind == TEXT:
+            continue
+        elif kind == HEADER:
+            metadata.headings.append((node.level, text_content(node).strip()))
+        elif kind == LINK:
+            metadata.links.append(url_builder(node.href))
+        elif kind == REFERENCE:
+            metadata.links.append(node.children[0].value)
+        elif kind == IMAGE:
+            metadata.images.append((node.path, node.alt))
+        elif kind == CODEBLOCK:
+            metadata.languages.append(node.lang)
+            continue # The code is never anything but text
+        stack.extend(reversed(node.children))
+
+# The text of every TEXT node under @node, in order
+def text_content(node) -> str:
+    text = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.kind == TEXT:
+            text.append(node.value)
+        else:
+            stack.extend(reversed(node.children))
+    return ''.join(text)
@@ -0,0 +1,87 @@
+# Pathological inputs compiled under limits.untrusted. Every case has to
+# either compile or raise an errors.MarkError, within the time limit.
+#
+#   python -m mark.benchmarks.adversarial [--size 200000] [--slack 0.5]
+#
+# The cases blow up one thing the parser has to keep track of: unclosed
+# inline elements, blockquote and list nesting, runs of keywords. Each is cut
+# to about --size characters, which is kept under the size limit so it's the
+# other limits that get hit. Exits with 1 if a case raised anything else or
+# took longer than max_seconds plus --slack seconds.
+from mark.markdown import Compiler
+from mark.errors import MarkError
+from mark import limits
+import argparse
+import sys
+import time
+
+def nested_lines(line, size: int) -> str:
+    lines = []
+    total, depth = 0, 1
+    while total < size:
+        lines.append(line(depth))
+        total += len(lines[-1])
+        depth += 1
+    return ''.join(lines)
+
+# name: (unit repeated up to the size) or a function of the size
+cases = {
+    "unclosed bold": "**a ",
+    "unclosed italic": "*",
+    "unclosed links": "[",
+    "unclosed link targets": "[a](b",
+    "unclosed images": "![",
+    "unclosed monospace": "`a",
+    "unclosed references": "<",
+    "alternating emphasis": "*a**",
+    "keyword soup": "*[`!<>",
+    "escapes": "\\",
+    "fences": "```\n",
+    "blank lines": "\n",
+    "hyphens": "-",
+    "hashes": "#",
+    "ordered items": "+ a\n",
+    "nested blockquote": lambda size: "> " * (size // 2) + "x\n",
+    "blockquote staircase": lambda size: nested_lines(lambda depth: "> " * depth + "x\n", size),
+    "list staircase": lambda size: nested_lines(lambda depth: "\t" * (depth - 1) + "- x\n", size),
+    "blockquoted lists": lambda size: "> - " * (size // 4) + "x\n",
+    "tab run": lambda size: "- x\n" + "\t" * size + "- y\n",
+}
+
+def generate(case, size: int) -> str:
+    if callable(case):
+        return case(size)
+    return (case * (size // len(case) + 1))[:size]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--slack", type=float, default=0.5,
+                        help="seconds a case can go over the time limit")
+    args = parser.parse_args()
+
+    budget = limits.untrusted
+    sources = {name: generate(case, args.size) for name, case in cases.items()}
+    sources["over the size limit"] = "a" * (budget.max_size + 1)
+
+    failed = False
+    for name, source in sources.items():
+        start = time.perf_counter()
+        try:
+            Compiler(source, False, False, False, limits=budget).compile(0)
+            outcome = "compiled"
+        except MarkError as error:
+            outcome = type(error).__name__
+        except Exception as error:
+            outcome = f"UNEXPECTED {type(error).__name__}: {error}"
+            failed = True
+        seconds = time.perf_counter() - start
+
+        if seconds > budget.max_seconds + args.slack:
+            outcome += "  OVER BUDGET"
+            failed = True
+        print(f"{name:>22} {len(source):>9} {seconds * 1000:8.1f}ms  {outcome}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# Rendering html, plain text and JSON with one walk of the document against
+# one walk (and renderer) per format. The html is checked to be the same
+# whatever sink it's written to, and the JSON to be the same when its
+# renderer is walked again, before anything is timed.
+#
+#   python -m mark.benchmarks.backends [--size 1000000] [--repeat 5]
+from mark.markdown import Compiler
+from mark.output_generation import walk, HtmlRenderer, TextRenderer, JsonRenderer
+from mark.benchmarks import corpus
+from mark.benchmarks.timing import best_time
+import argparse
+import io
+import json
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--prettify", action="store_true")
+    args = parser.parse_args()
+
+    compiler = Compiler(corpus.generate(args.size), False, False, args.prettify)
+    document = compiler.parser.document
+    html = compiler.compile(0)
+    for sink in (io.StringIO(), io.BytesIO()):
+        compiler.compile_to(sink, 0)
+        written = sink.getvalue()
+        if (written.decode("utf-8") if isinstance(written, bytes) else written) != html:
+            raise SystemExit(f"The html written to a {type(sink).__name__} differs from compile()")
+    out = []
+    renderer = JsonRenderer(out.append)
+    dumps = []
+    for _ in range(2):
+        walk(document, [renderer])
+        dumps.append(''.join(out))
+        out.clear()
+    if dumps[0] != dumps[1]:
+        raise SystemExit("A JsonRenderer walked again writes different JSON")
+    json.loads(dumps[0])
+
+    makers = {
+        "html": lambda write: HtmlRenderer(write, args.prettify, 0),
+        "text": TextRenderer,
+        "json": JsonRenderer,
+    }
+
+    def separately():
+        for make in makers.values():
+            walk(document, [make([].append)])
+
+    def together():
+        walk(document, [make([].append) for make in makers.values()])
+
+    for name, make in makers.items():
+        seconds = best_time(lambda: walk(document, [make([].append)]), args.repeat)
+        print(f"{name:>10} {seconds * 1000:8.1f}ms")
+    apart = best_time(separately, args.repeat)
+    once = best_time(together, args.repeat)
+    print(f"{'separate':>10} {apart * 1000:8.1f}ms")
+    print(f"{'one walk':>10} {once * 1000:8.1f}ms  {apart / once:5.2f}x")
+
+if __name__ == "__main__":
+    main()
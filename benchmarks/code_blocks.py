@@ -0,0 +1,50 @@
+# Cost of documents made of huge fenced code blocks, with the lexer taking the
+# code of each block as a single CODE token and with the code lexed into
+# ordinary tokens.
+#
+#   python -m mark.benchmarks.code_blocks [--megabytes 1 4 16] [--blocks 1] [--repeat 3]
+#
+# The code is python heavy on characters that are keywords outside of a code
+# block (#, *, -, [, (, <). The token path is timed by lexing the code blocks
+# back into tokens (lexer.expand_code) and parsing those; rendering is the same
+# for both.
+from mark.lexer import Lexer, expand_code
+from mark.parser import Parser
+from mark.output_generation import OutputGenerator
+from mark.benchmarks.timing import best_run
+import argparse
+
+code_sample = '''# Split the rows into [chunks] of at most *size*, see <docs>
+def chunks(rows: list, size: int = 64) -> list:
+    out = [rows[i:i + size] for i in range(0, len(rows), size)]
+    total = sum(len(chunk) ** 2 for chunk in out) - 1  # weight & sort
+    return sorted(out, key=lambda chunk: (-len(chunk), chunk[0] if chunk else None))
+
+'''
+
+def code_document(megabytes: float, blocks: int) -> str:
+    code = code_sample * max(1, int(megabytes * (1 << 20) / blocks / len(code_sample)))
+    return "".join(f"Block {i}\n```py\n{code}```\n\n" for i in range(blocks))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--blocks", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'MB':>6} {'path':>6} {'tokens':>9} {'lex':>9} {'parse':>9} {'render':>9} {'total':>9}")
+    for megabytes in args.megabytes:
+        source = code_document(megabytes, args.blocks)
+        lex, tokens = best_run(lambda: Lexer(source, False).tokens, args.repeat)
+        expand, expanded = best_run(lambda: expand_code(tokens), args.repeat)
+
+        for path, lex_time, path_tokens in (("code", lex, tokens), ("tokens", lex + expand, expanded)):
+            parse, parsed = best_run(lambda: Parser(path_tokens, False).document, args.repeat)
+            render, html = best_run(lambda: OutputGenerator(parsed, False).compile(0), args.repeat)
+            total = lex_time + parse + render
+            print(f"{len(source) / (1 << 20):6.1f} {path:>6} {len(path_tokens):9} {lex_time * 1000:7.1f}ms "
+                  f"{parse * 1000:7.1f}ms {render * 1000:7.1f}ms {total * 1000:7.1f}ms")
+
+if __name__ == "__main__":
+    main()
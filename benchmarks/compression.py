@@ -0,0 +1,74 @@
+# Writing a page with precompressed copies (compile_to_file with encodings)
+# against writing the html alone, and against compressing the whole html
+# string after compiling it.
+#
+#   python -m mark.benchmarks.compression [--size 4000000] [--levels 1 6 9] [--repeat 3]
+#
+# The document is parsed once, only rendering, writing and compressing are
+# timed. Peak memory is what tracemalloc sees allocated on top of the parsed
+# document while the files are written, in a separate untimed run.
+from mark.markdown import Compiler
+from mark.benchmarks import corpus
+from mark.benchmarks.timing import best_run
+import argparse
+import gc
+import gzip
+import os
+import tempfile
+import time
+import tracemalloc
+
+def peak_memory(function) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=4_000_000)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    compiler = Compiler(corpus.generate(args.size), False, False, False)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "page.html")
+
+    def whole_string(level: int):
+        # The html built up in full, then gzipped in one go
+        html = compiler.compile(0).encode("utf-8")
+        with open(path, "wb") as file:
+            file.write(html)
+        start = time.perf_counter()
+        compressed = gzip.compress(html, level, mtime=0)
+        seconds = time.perf_counter() - start
+        with open(path + ".gz", "wb") as file:
+            file.write(compressed)
+        return {"sizes": {"html": len(html), "gzip": len(compressed)}, "compress_seconds": seconds}
+
+    runs = [("html only", lambda: compiler.compile_to_file(path, 0))]
+    for level in args.levels:
+        runs.append((f"gzip {level}", lambda level=level: compiler.compile_to_file(path, 0, ("gzip",), level)))
+        runs.append((f"gzip+deflate {level}",
+                     lambda level=level: compiler.compile_to_file(path, 0, ("gzip", "deflate"), level)))
+        runs.append((f"whole string {level}", lambda level=level: whole_string(level)))
+
+    print(f"{'':>18} {'total':>9} {'compress':>9} {'peak mem':>9}  sizes")
+    for name, run in runs:
+        seconds, report = best_run(run, args.repeat)
+        peak = peak_memory(run)
+        compress = 0.0 if report is None else report["compress_seconds"]
+        sizes = "" if report is None else "  ".join(f"{encoding} {size / 1e6:.2f}MB"
+                                                   for encoding, size in report["sizes"].items())
+        print(f"{name:>18} {seconds * 1000:7.0f}ms {compress * 1000:7.0f}ms {peak / 1e6:7.1f}MB  {sizes}")
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Deterministic markdown corpus for the benchmarks. Every construct from
+# supported_syntax.md has a generator that takes a scale, so one construct
+# can be blown up while the rest stay ordinary.
+import random
+
+words = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua").split()
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(words) for _ in range(length))
+
+# One paragraph of @scale lines
+def paragraph(rng: random.Random, scale: int) -> str:
+    return "\n".join(_sentence(rng, 12) for _ in range(scale)) + "\n"
+
+def header(rng: random.Random, scale: int) -> str:
+    return "#" * rng.randint(1, 6) + " " + _sentence(rng, scale + 2) + "\n"
+
+def horizontal_rule(rng: random.Random, scale: int) -> str:
+    return "-" * (3 + scale) + "\n"
+
+# A list of @scale items that indents by up to @scale levels and back out
+def nested_list(rng: random.Random, scale: int) -> str:
+    lines = []
+    depth = 0
+    for i in range(scale):
+        marker = "-" if rng.random() < 0.5 else "+"
+        if i == 0:
+            depth = 0
+        else:
+            depth = max(0, min(depth + rng.choice((-1, 0, 1, 1)), scale))
+        lines.append("    " * depth + f"{marker} {_sentence(rng, 4)}")
+    return "\n".join(lines) + "\n"
+
+# A fenced code block of @scale lines
+def code_block(rng: random.Random, scale: int) -> str:
+    lines = [f"int v{i} = {rng.randint(0, 999)}; // {_sentence(rng, 5)} <&>"
+             for i in range(scale)]
+    return "```c\n" + "\n".join(lines) + "\n```\n"
+
+# A line packed with @scale bold, italic, link, image and monospace runs
+def inline_run(rng: random.Random, scale: int) -> str:
+    styles = (
+        lambda: f"**{rng.choice(words)}**",
+        lambda: f"*{rng.choice(words)}*",
+        lambda: f"***{rng.choice(words)}* {rng.choice(words)}**",
+        lambda: f"[{rng.choice(words)}]({rng.choice(words)}.com)",
+        lambda: f"![{rng.choice(words)}]({rng.choice(words)}.png)",
+        lambda: f"`{rng.choice(words)}`",
+        lambda: f"<{rng.choice(words)}.org>",
+    )
+    return " ".join(rng.choice(styles)() for _ in range(scale)) + "\n"
+
+# A blockquote that continues for @scale lines
+def blockquote(rng: random.Random, scale: int) -> str:
+    return "\n".join(f"> {_sentence(rng, 8)}" for _ in range(scale)) + "\n"
+
+constructs = {
+    "paragraph": paragraph,
+    "header": header,
+    "horizontal_rule": horizontal_rule,
+    "nested_list": nested_list,
+    "code_block": code_block,
+    "inline_run": inline_run,
+    "blockquote": blockquote,
+}
+
+# Builds roughly @size characters of markdown. @scales maps construct names to
+# how big each of their blocks is (default 4). Only constructs in @scales are
+# used if it's given.
+def generate(size: int, scales=None, seed=0) -> str:
+    rng = random.Random(seed)
+    scales = scales or {name: 4 for name in constructs}
+    names = sorted(scales)
+
+    blocks = []
+    length = 0
+    while length < size:
+        name = rng.choice(names)
+        block = constructs[name](rng, scales[name])
+        blocks.append(block)
+        length += len(block) + 1
+    return "\n".join(blocks)
@@ -0,0 +1,64 @@
+# Peak memory of compiling a file read into a str against Compiler.from_path.
+#
+#   python -m mark.benchmarks.file_memory [--sizes 8 32]
+#
+# A corpus (see corpus.py) of every size is written to a temporary file and
+# compiled to /dev/null both ways, each in a fresh interpreter. "heap" is the
+# peak of the python allocations, "ast" what the lexer and parser keep. With
+# from_path the input is a memory map, so the heap should be about the ast.
+from mark.benchmarks import corpus
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+child = """
+import os, resource, sys, tracemalloc
+from mark.markdown import Compiler
+
+path, mode = sys.argv[1], sys.argv[2]
+tracemalloc.start()
+if mode == "read":
+    with open(path, encoding="utf-8") as file:
+        compiler = Compiler(file.read(), False, False, True)
+else:
+    compiler = Compiler.from_path(path, False, False, True)
+ast = tracemalloc.get_traced_memory()[0]
+with open(os.devnull, "w") as out:
+    compiler.compile_to(out, 0)
+peak = tracemalloc.get_traced_memory()[1]
+print(peak, ast, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+"""
+
+def measure(path: str, mode: str) -> tuple:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([os.path.dirname(os.path.dirname(here)),
+                                         env.get("PYTHONPATH", "")])
+    out = subprocess.run([sys.executable, "-c", child, path, mode],
+                         env=env, capture_output=True, text=True, check=True)
+    return tuple(map(int, out.stdout.split()))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32],
+                        help="input sizes in MB")
+    args = parser.parse_args()
+
+    print(f"{'input':>8} {'mode':>9} {'heap':>10} {'ast':>10} {'peak rss':>10} {'heap/input':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mb in args.sizes:
+            size = mb * 1024 * 1024
+            path = os.path.join(directory, f"{mb}.md")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(corpus.generate(size))
+
+            for mode in ("read", "from_path"):
+                heap, ast, rss = measure(path, mode)
+                print(f"{mb:>6}MB {mode:>9} {heap / 2**20:>8.1f}MB {ast / 2**20:>8.1f}MB "
+                      f"{rss / 2**20:>8.1f}MB {heap / size:>10.2f}x")
+
+if __name__ == "__main__":
+    main()
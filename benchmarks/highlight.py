@@ -0,0 +1,86 @@
+# Cost of highlighting code blocks, and what the highlight cache saves when
+# the same snippets show up on many pages.
+#
+#   python -m mark.benchmarks.highlight [--pages 300] [--snippets 20] [--repeat 5]
+#
+# Every page has a few paragraphs and code blocks picked from a fixed set of
+# snippets. The pages are parsed once, only rendering is timed: plain, with
+# highlighting and an empty cache, and with highlighting and a warm cache.
+from mark.markdown import Compiler
+from mark import highlighting
+from mark.benchmarks import corpus
+from mark.benchmarks.timing import best_time
+import argparse
+import random
+
+python_snippet = '''@cached
+def lookup(table: dict, key: str, default=None):
+    # Walk the chain until a match is found
+    for i in range(len(table)):
+        if table.get(key) is not None:
+            return table[key] * 2.5
+    return default
+'''
+
+shell_snippet = '''for file in "$SRC"/*.md; do
+    echo "building ${file}" # progress
+    python -m mark build "$SRC" "$DST" --prettify
+done
+'''
+
+json_snippet = '''{"name": "mark", "version": 3, "pages": [1, 2, 3], "draft": false, "parent": null}
+'''
+
+c_snippet = '''#include <stdio.h>
+int main(int argc, char **argv) {
+    /* count the arguments */
+    for (int i = 0; i < argc; i++) printf("%s", argv[i]);
+    return 0x0;
+}
+'''
+
+def snippets(count: int) -> list:
+    bases = (("py", python_snippet), ("sh", shell_snippet), ("json", json_snippet), ("c", c_snippet))
+    blocks = []
+    for i in range(count):
+        lang, code = bases[i % len(bases)]
+        # Every snippet is different from the others, but repeats across pages
+        blocks.append(f"```{lang}\n{code * (1 + i // len(bases))}```\n")
+    return blocks
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--snippets", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    blocks = snippets(args.snippets)
+    pages = []
+    for page in range(args.pages):
+        parts = [corpus.generate(2000, seed=page)]
+        parts += [rng.choice(blocks) for _ in range(4)]
+        pages.append(Compiler("\n".join(parts), False, False, False))
+
+    def render(highlight: bool):
+        for page in pages:
+            page.output_gen.highlight = highlight
+            page.compile(0)
+
+    def cold():
+        highlighting.shared_cache = highlighting.HighlightCache(highlighting.shared_cache.max_bytes)
+        render(True)
+
+    plain = best_time(lambda: render(False), args.repeat)
+    uncached = best_time(cold, args.repeat)
+    render(True)
+    cached = best_time(lambda: render(True), args.repeat)
+    print(f"{args.pages} pages, {args.snippets} distinct snippets")
+    print(f"{'plain':>16} {plain * 1000:8.1f}ms")
+    print(f"{'cold cache':>16} {uncached * 1000:8.1f}ms  +{(uncached - plain) * 1000:.1f}ms highlighting")
+    print(f"{'warm cache':>16} {cached * 1000:8.1f}ms  +{(cached - plain) * 1000:.1f}ms highlighting")
+    print(highlighting.shared_cache.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Peak memory of the lexer against the size of its input.
+#
+#   python -m mark.benchmarks.lexer_memory [--sizes 1 2 4 8 16] [--source FILE]
+#
+# Every size is lexed in a fresh interpreter so the peak RSS it reports
+# belongs to that size alone. "scratch" is what the lexer allocated on top of
+# the tokens it returns, copies of the source would show up there.
+import argparse
+import os
+import subprocess
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+default_source = os.path.join(here, "..", "supported_syntax.md")
+
+child = """
+import resource, sys, tracemalloc
+from mark.lexer import Lexer
+
+size = int(sys.argv[1])
+with open(sys.argv[2]) as file:
+    sample = file.read()
+source = (sample * (size // len(sample) + 1))[:size]
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+lexer = Lexer(source, False)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tokens = len(lexer.tokens)
+del lexer
+
+tracemalloc.start()
+lexer = Lexer(source, False)
+retained, peak = tracemalloc.get_traced_memory()
+print(before * 1024, after * 1024, peak - retained, tokens)
+"""
+
+def measure(size: int, source: str) -> tuple:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([os.path.dirname(os.path.dirname(here)),
+                                         env.get("PYTHONPATH", "")])
+    out = subprocess.run([sys.executable, "-c", child, str(size), source],
+                         env=env, capture_output=True, text=True, check=True)
+    before, after, scratch, tokens = map(int, out.stdout.split())
+    return after - before, scratch, tokens
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 8, 16, 32],
+                        help="input sizes in MB")
+    parser.add_argument("--source", default=default_source,
+                        help="markdown repeated to fill each size")
+    args = parser.parse_args()
+
+    print(f"{'input':>10} {'tokens':>10} {'peak rss':>10} {'rss/input':>10} {'scratch/input':>14}")
+    for mb in args.sizes:
+        size = mb * 1024 * 1024
+        peak, scratch, tokens = measure(size, args.source)
+        print(f"{mb:>8}MB {tokens:>10} {peak / 2**20:>8.1f}MB "
+              f"{peak / size:>9.2f}x {scratch / size:>13.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Parse time of a single list against its number of items.
+#
+#   python -m mark.benchmarks.list_scaling [--items 12500 25000 50000 100000]
+#
+# Every shape is one list: "flat" never indents, "sawtooth" indents one more
+# level per item up to 16 and starts over, "zigzag" goes 64 levels deep and
+# back out. Parsing should
+# grow linearly with the item count, the run fails if any shape grows faster
+# than size^threshold from the smallest to the largest size.
+from mark.lexer import Lexer
+from mark.parser import Parser
+import argparse
+import gc
+import math
+import sys
+import time
+
+def flat(items: int) -> list:
+    return [0] * items
+
+def sawtooth(items: int) -> list:
+    return [i % 16 for i in range(items)]
+
+# Up 64 levels and back down again
+def zigzag(items: int) -> list:
+    return [abs(i % 128 - 64) for i in range(items)]
+
+shapes = {"flat": flat, "sawtooth": sawtooth, "zigzag": zigzag}
+
+def make_list(depths: list) -> str:
+    return "\n".join("    " * depth + f"- item {i}" for i, depth in enumerate(depths)) + "\n"
+
+def time_parse(source: str, repeat: int) -> float:
+    tokens = Lexer(source, False).tokens
+    best = math.inf
+    # Like timeit, so full collections over the growing tree don't count
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            Parser(tokens, False)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[12_500, 25_000, 50_000, 100_000])
+    parser.add_argument("--shapes", nargs="+", default=sorted(shapes), choices=sorted(shapes))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="scaling exponent above which parsing is superlinear")
+    args = parser.parse_args()
+
+    flags = []
+    for name in args.shapes:
+        times = []
+        for items in sorted(args.items):
+            seconds = time_parse(make_list(shapes[name](items)), args.repeat)
+            times.append((items, seconds))
+            print(f"{name:>10} {items:>8} items  {seconds * 1000:9.2f}ms  "
+                  f"{seconds / items * 1e6:6.2f}us/item")
+
+        # Over the whole range, a single step is too noisy to go by
+        (n1, t1), (n2, t2) = times[0], times[-1]
+        k = math.log(t2 / t1) / math.log(n2 / n1)
+        if k > args.threshold:
+            flags.append(f"superlinear: {name} {n1} -> {n2} items grows as size^{k:.2f}")
+
+    for flag in flags:
+        print(flag)
+    return 1 if flags else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# Time of analysis.extract against a full compile of the same document, the
+# way an indexer would get the same information by scraping the html.
+#
+#   python -m mark.benchmarks.metadata [--sizes 100000 1000000] [--repeat 5]
+#
+# The metadata is checked against analysis.extract_document of the fully
+# parsed document.
+from mark.markdown import Compiler
+from mark import analysis
+from mark.benchmarks import corpus
+from mark.benchmarks.timing import best_time
+import argparse
+
+def fields(metadata: analysis.Metadata) -> tuple:
+    return metadata.headings, metadata.links, metadata.images, metadata.languages
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 4_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'compile':>10} {'extract':>10} {'fraction':>9}")
+    for size in args.sizes:
+        source = corpus.generate(size)
+        document = Compiler(source, False, False, False).parser.document
+        if fields(analysis.extract(source)) != fields(analysis.extract_document(document)):
+            raise SystemExit(f"Extracted metadata differs at size {size}")
+
+        compiled = best_time(lambda: Compiler(source, False, False, False).compile(0), args.repeat)
+        extracted = best_time(lambda: analysis.extract(source), args.repeat)
+        print(f"{len(source):>10} {compiled * 1000:8.1f}ms {extracted * 1000:8.1f}ms "
+              f"{extracted / compiled:8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Compile time of documents that nest a single construct deeper and deeper.
+#
+#   python -m mark.benchmarks.nesting_depth [--depths 1000 10000 50000]
+#
+# Nothing in the parser or the html generation recurses per nesting level, so
+# every depth should compile, in time proportional to the depth. Output isn't
+# prettified, its indentation alone would grow with the square of the depth.
+from mark.markdown import Compiler
+import argparse
+import sys
+import time
+
+documents = {
+    "blockquote": lambda depth: "> " * depth + "deep\n",
+    "link": lambda depth: "[" * depth + "x" + "](u)" * depth + "\n",
+    "italic_link": lambda depth: "*[" * depth + "x" + "](u)*" * depth + "\n",
+    "monospace_link": lambda depth: "`" + "[" * depth + "x" + "](u)" * depth + "`\n",
+}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depths", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--documents", nargs="+", default=sorted(documents),
+                        choices=sorted(documents))
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.documents:
+        for depth in sorted(args.depths):
+            source = documents[name](depth)
+            start = time.perf_counter()
+            try:
+                html = Compiler(source, False, False, False).compile(0)
+            except RecursionError:
+                print(f"{name:>15} {depth:>7} deep  hit the recursion limit")
+                failed = True
+                continue
+            seconds = time.perf_counter() - start
+            print(f"{name:>15} {depth:>7} deep  {seconds * 1000:9.2f}ms  {len(html):>9} chars")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
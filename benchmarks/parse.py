@@ -0,0 +1,96 @@
+# Parse stage time over the syntax in supported_syntax.md.
+#
+#   python -m mark.benchmarks.parse [--size 2000000] [--against REV]
+#
+# The sample is repeated up to about --size characters, cut at the end of a
+# block so no code block is left open, and lexed once. Then only the parser is
+# timed, best of --repeat runs. With --against the package as it was at git
+# revision REV is timed the same way, to show the speedup of a change to the
+# parser. Every package is timed in its own interpreter.
+from mark.incremental import cut_blocks
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+package = os.path.dirname(here)
+default_source = os.path.join(package, "supported_syntax.md")
+
+child = """
+import gc, sys, time
+from mark.lexer import Lexer
+from mark.parser import Parser
+
+with open(sys.argv[1]) as file:
+    source = file.read()
+repeat = int(sys.argv[2])
+tokens = Lexer(source, False).tokens
+
+best = float("inf")
+for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    Parser(tokens, False)
+    best = min(best, time.perf_counter() - start)
+print(best, len(tokens))
+"""
+
+# @sample repeated up to about @size characters, cut at the end of a block
+def fill(sample: str, size: int) -> str:
+    sample = sample.rstrip("\n") + "\n\n"
+    source = sample * (size // len(sample) + 1)
+    ends = [end for _, end in cut_blocks(source)]
+    return source[:max([end for end in ends if end <= size], default=ends[0])]
+
+# Times the package found in @root on the markdown in the file @path,
+# returns (seconds, tokens)
+def measure(root: str, path: str, repeat: int) -> tuple:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([root, env.get("PYTHONPATH", "")])
+    out = subprocess.run([sys.executable, "-c", child, path, str(repeat)],
+                         env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.stderr.write(out.stderr)
+        raise SystemExit(f"Timing the package in {root} failed")
+    seconds, tokens = out.stdout.split()
+    return float(seconds), int(tokens)
+
+# Checks out @revision of the package as <directory>/mark
+def checkout(revision: str, directory: str) -> str:
+    target = os.path.join(directory, "mark")
+    os.makedirs(target)
+    archive = subprocess.run(["git", "-C", package, "archive", revision],
+                             capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+    return directory
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2_000_000, help="input size in characters")
+    parser.add_argument("--source", default=default_source,
+                        help="markdown repeated to fill the input")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--against", help="git revision to compare with")
+    args = parser.parse_args()
+
+    with open(args.source) as file:
+        source = fill(file.read(), args.size)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "source.md")
+        with open(path, "w") as file:
+            file.write(source)
+
+        seconds, tokens = measure(os.path.dirname(package), path, args.repeat)
+        print(f"{'current':>12} {seconds * 1000:9.2f}ms  {seconds / tokens * 1e9:7.1f}ns/token"
+              f"  ({tokens} tokens)")
+
+        if args.against:
+            root = checkout(args.against, directory)
+            old, _ = measure(root, path, args.repeat)
+            print(f"{args.against:>12} {old * 1000:9.2f}ms  {old / tokens * 1e9:7.1f}ns/token")
+            print(f"{'speedup':>12} {old / seconds:9.2f}x")
+
+if __name__ == "__main__":
+    main()
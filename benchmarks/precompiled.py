@@ -0,0 +1,35 @@
+# Rendering a precompiled document (serialize.dumps) against compiling it from
+# its source, for growing corpus sizes.
+#
+#   python -m mark.benchmarks.precompiled [--sizes 100000 1000000] [--repeat 5]
+#
+# "compile" is lex + parse + render, "load" is serialize.loads + render. Both
+# have to produce the same html. The size of the precompiled data is printed
+# next to the size of the source.
+from mark.markdown import Compiler
+from mark.benchmarks import corpus
+from mark.benchmarks.timing import best_time
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 4_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--prettify", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'ast bytes':>10} {'compile':>10} {'load':>10} {'speedup':>8}")
+    for size in args.sizes:
+        source = corpus.generate(size)
+        data = Compiler(source, False, False, args.prettify).dump_ast()
+        html = Compiler(source, False, False, args.prettify).compile(0)
+        if Compiler.from_ast(data, args.prettify).compile(0) != html:
+            raise SystemExit(f"Precompiled html differs at size {size}")
+
+        compiled = best_time(lambda: Compiler(source, False, False, args.prettify).compile(0), args.repeat)
+        loaded = best_time(lambda: Compiler.from_ast(data, args.prettify).compile(0), args.repeat)
+        print(f"{len(source):>10} {len(data):>10} {compiled * 1000:8.1f}ms "
+              f"{loaded * 1000:8.1f}ms {compiled / loaded:7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Per call cost of a shared markdown.Markdown against a new Compiler for every
+# document, on small documents like the ones a web worker gets. Then compiles
+# the same documents from a thread pool and checks the html is the same.
+#
+#   python -m mark.benchmarks.reuse [--documents 2000] [--size 2000] [--threads 8]
+from mark.markdown import Compiler, Markdown
+from mark.benchmarks import corpus
+from mark.benchmarks.timing import best_time
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import sys
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=2000, help="characters per document")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sources = [corpus.generate(args.size, seed=seed) for seed in range(args.documents)]
+    markdown = Markdown(prettify=False)
+    serial = [Compiler(source, False, False, False).compile(0) for source in sources]
+    if markdown.compile_many(sources) != serial:
+        return "Markdown.compile_many differs from Compiler"
+
+    compiler = best_time(lambda: [Compiler(source, False, False, False).compile(0) for source in sources],
+                         args.repeat)
+    shared = best_time(lambda: markdown.compile_many(sources), args.repeat)
+    with ThreadPoolExecutor(args.threads) as pool:
+        if markdown.compile_many(sources, pool) != serial:
+            return "Threaded compile_many differs from Compiler"
+        threaded = best_time(lambda: markdown.compile_many(sources, pool), args.repeat)
+
+    per_document = 1e6 / len(sources)
+    print(f"{len(sources)} documents of {args.size} characters, free threading: "
+          f"{not getattr(sys, '_is_gil_enabled', lambda: True)()}")
+    print(f"{'Compiler':>22} {compiler * per_document:8.1f}us per document")
+    print(f"{'Markdown':>22} {shared * per_document:8.1f}us per document")
+    print(f"{f'Markdown, {args.threads} threads':>22} {threaded * per_document:8.1f}us per document")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Latency of small documents sent to `python -m mark serve` while large ones
+# are being compiled too, with the large ones sent to the worker pool (the
+# default) and with every document compiled on the event loop.
+#
+#   python -m mark.benchmarks.serve_latency [--seconds 5] [--clients 16] [--large-clients 2]
+#
+# Each client keeps one connection open and sends its next document as soon as
+# it has the html of the last one. Small documents are about 2kB and large
+# ones about --large-kb; only the latencies of the small ones are reported.
+from mark.benchmarks import corpus
+import argparse
+import asyncio
+import math
+import re
+import subprocess
+import sys
+import time
+
+def percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return math.nan
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+async def request(reader, writer, body: bytes) -> int:
+    writer.write(b"POST /compile HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(re.search(rb"Content-Length: (\d+)", head).group(1))
+    await reader.readexactly(length)
+    return int(head.split()[1])
+
+async def client(port: int, body: bytes, until: float, latencies: list, statuses: dict) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        status = await request(reader, writer, body)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+async def load(port: int, args) -> tuple:
+    small = corpus.generate(2000, seed=1).encode()
+    large = corpus.generate(args.large_kb * 1000, seed=2).encode()
+    until = time.perf_counter() + args.seconds
+    small_latencies, large_latencies, statuses = [], [], {}
+    await asyncio.gather(
+        *[client(port, small, until, small_latencies, statuses) for _ in range(args.clients)],
+        *[client(port, large, until, large_latencies, statuses) for _ in range(args.large_clients)])
+    return sorted(small_latencies), len(large_latencies), statuses
+
+def run(args, inline_bytes: int) -> tuple:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "mark", "serve", "--port", "0", "--inline-bytes", str(inline_bytes),
+         "--max-bytes", str(args.large_kb * 2000), "--timeout", "60"]
+        + ([] if args.workers is None else ["-j", str(args.workers)]),
+        stderr=subprocess.PIPE, text=True)
+    try:
+        port = int(re.search(r":(\d+),", server.stderr.readline()).group(1))
+        return asyncio.run(load(port, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--large-clients", type=int, default=2)
+    parser.add_argument("--large-kb", type=int, default=500)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients sending 2kB documents, {args.large_clients} sending {args.large_kb}kB ones")
+    print(f"{'large documents':>16} {'small/s':>8} {'p50':>9} {'p99':>9} {'max':>9} {'large':>6}  statuses")
+    for name, inline_bytes in (("in the pool", 8192), ("on the loop", args.large_kb * 2000)):
+        small, large, statuses = run(args, inline_bytes)
+        print(f"{name:>16} {len(small) / args.seconds:8.0f} {percentile(small, 50) * 1000:7.1f}ms "
+              f"{percentile(small, 99) * 1000:7.1f}ms {percentile(small, 100) * 1000:7.1f}ms {large:6}  {statuses}")
+
+if __name__ == "__main__":
+    main()
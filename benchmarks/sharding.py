@@ -0,0 +1,46 @@
+# Speedup of parallel.compile_parallel over the serial compile of one big
+# document, for a growing number of shards.
+#
+#   python -m mark.benchmarks.sharding [--size 16000000] [--shards 1 2 4 8]
+#
+# Every shard count runs on that many processes (capped by --jobs) and its
+# html has to be identical to the serial html. Process start up and sending
+# the shards to the workers and back are part of the time.
+from mark.markdown import Compiler
+from mark.parallel import compile_parallel, shard_spans
+from mark.benchmarks import corpus
+import argparse
+import os
+import sys
+import time
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=16_000_000, help="document size in characters")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="most processes to use")
+    parser.add_argument("--prettify", action="store_true")
+    args = parser.parse_args()
+
+    source = corpus.generate(args.size)
+    start = time.perf_counter()
+    serial = Compiler(source, False, False, args.prettify).compile(0)
+    baseline = time.perf_counter() - start
+    print(f"{len(source)} characters, {os.cpu_count()} cpus")
+    print(f"{'serial':>10} {baseline * 1000:10.1f}ms")
+
+    failed = False
+    for shards in args.shards:
+        jobs = min(shards, args.jobs)
+        start = time.perf_counter()
+        html = compile_parallel(source, args.prettify, 0, jobs=jobs, shards=shards)
+        seconds = time.perf_counter() - start
+        same = "" if html == serial else "  OUTPUT DIFFERS"
+        failed = failed or html != serial
+        print(f"{shards:>4} shards {seconds * 1000:10.1f}ms  {baseline / seconds:5.2f}x  "
+              f"({len(shard_spans(source, shards))} cut, {jobs} processes){same}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
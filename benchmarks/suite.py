@@ -0,0 +1,142 @@
+# Times the lexer, parser and html generation separately over growing inputs.
+#
+#   python -m mark.benchmarks.suite --output new.json [--compare old.json]
+#
+# Every profile is a corpus (see corpus.py): "mixed" uses every construct at
+# an ordinary size, the others blow up a single construct. A stage whose time
+# grows faster than its input is flagged as superlinear, and with --compare
+# any stage that got slower than the earlier run is flagged as a regression.
+from mark.lexer import Lexer
+from mark.parser import Parser
+from mark.output_generation import OutputGenerator
+from mark.benchmarks import corpus
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+stages = ("lex", "parse", "render")
+
+profiles = {"mixed": None}
+profiles.update({name: {name: 64} for name in corpus.constructs})
+
+def time_stages(source: str, repeat: int) -> dict:
+    best = {stage: math.inf for stage in stages}
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        lexer = Lexer(source, False)
+        lexed = time.perf_counter()
+        parser = Parser(lexer.tokens, False)
+        parsed = time.perf_counter()
+        OutputGenerator(parser.document, True).compile(0)
+        rendered = time.perf_counter()
+
+        best["lex"] = min(best["lex"], lexed - start)
+        best["parse"] = min(best["parse"], parsed - lexed)
+        best["render"] = min(best["render"], rendered - parsed)
+    return best
+
+# Peak traced allocations of each stage, on top of what the earlier stages keep
+def peak_memory(source: str) -> dict:
+    peaks = {}
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    lexer = Lexer(source, False)
+    peaks["lex"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    parser = Parser(lexer.tokens, False)
+    peaks["parse"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    OutputGenerator(parser.document, True).compile(0)
+    peaks["render"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peaks
+
+def run(sizes: list, names: list, repeat: int) -> dict:
+    results = {}
+    for name in names:
+        results[name] = {}
+        for size in sizes:
+            source = corpus.generate(size, profiles[name])
+            results[name][str(size)] = {
+                "chars": len(source),
+                "seconds": time_stages(source, repeat),
+                "peak_bytes": peak_memory(source),
+            }
+            print(f"{name:>16} {size:>9}  " + "  ".join(
+                f"{stage} {results[name][str(size)]['seconds'][stage] * 1000:8.2f}ms"
+                for stage in stages), file=sys.stderr)
+    return results
+
+# Scaling exponent of every stage between consecutive sizes, time ~ size^k
+def superlinear(results: dict, threshold: float) -> list:
+    flags = []
+    for name, runs in results.items():
+        sizes = sorted(runs, key=int)
+        for small, large in zip(sizes, sizes[1:]):
+            a, b = runs[small], runs[large]
+            for stage in stages:
+                t1, t2 = a["seconds"][stage], b["seconds"][stage]
+                if t1 <= 0 or t2 <= 0:
+                    continue
+                k = math.log(t2 / t1) / math.log(b["chars"] / a["chars"])
+                if k > threshold:
+                    flags.append(f"superlinear: {name} {stage} {small} -> {large} "
+                                 f"grows as size^{k:.2f}")
+    return flags
+
+def regressions(old: dict, new: dict, tolerance: float) -> list:
+    flags = []
+    for name, runs in new.items():
+        for size, result in runs.items():
+            before = old.get(name, {}).get(size)
+            if before is None:
+                continue
+            for stage in stages:
+                t1, t2 = before["seconds"][stage], result["seconds"][stage]
+                if t1 > 0 and t2 / t1 > 1 + tolerance:
+                    flags.append(f"regression: {name} {stage} at {size} "
+                                 f"{t1 * 1000:.2f}ms -> {t2 * 1000:.2f}ms ({t2 / t1:.2f}x)")
+    return flags
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32_000, 128_000, 512_000],
+                        help="corpus sizes in characters")
+    parser.add_argument("--profiles", nargs="+", default=sorted(profiles),
+                        choices=sorted(profiles))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="earlier results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="scaling exponent above which a stage is superlinear")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown allowed before a stage counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.profiles, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    flags = superlinear(results, args.threshold)
+    if args.compare:
+        with open(args.compare) as file:
+            flags += regressions(json.load(file)["results"], results, args.tolerance)
+    report["flags"] = flags
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+    for flag in flags:
+        print(flag)
+    return 1 if flags else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
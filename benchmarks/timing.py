@@ -0,0 +1,19 @@
+# Timing shared by the benchmarks
+import gc
+import math
+import time
+
+# The best wall time of @repeat calls of @function. Garbage is collected before
+# every call, so none of it is left over from the call before.
+def best_time(function, repeat: int) -> float:
+    return best_run(function, repeat)[0]
+
+# Like best_time, along with what @function returned the last time
+def best_run(function, repeat: int) -> tuple:
+    best, result = math.inf, None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
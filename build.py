@@ -0,0 +1,136 @@
+from mark.markdown import Compiler
+from mark.cache import source_key
+from mark.compression import CompressedWriter, encoders
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+
+manifest_name = ".mark-manifest.json"
+
+def find_sources(src_dir: str) -> list:
+    sources = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".md"):
+                path = os.path.join(root, name)
+                sources.append(os.path.relpath(path, src_dir))
+    return sources
+
+def output_path(dst_dir: str, relpath: str) -> str:
+    return os.path.join(dst_dir, os.path.splitext(relpath)[0] + ".html")
+
+# Runs in a worker. Returns (relpath, key, error, report), key is None if
+# the file was skipped because it hasn't changed since the last build. report
+# is CompressedWriter.report() if the page was compressed, None otherwise.
+def _build_file(task: tuple) -> tuple:
+    src_dir, dst_dir, relpath, old_key, prettify, base_indent, highlight, encodings, level = task
+    try:
+        with open(os.path.join(src_dir, relpath), "rb") as file:
+            source = file.read()
+
+        key = source_key(source, prettify, base_indent, highlight)
+        if encodings: # Changing them rebuilds every page
+            key += f"|{'+'.join(encodings)}|{level}"
+        out_path = output_path(dst_dir, relpath)
+        out_paths = [out_path] + [out_path + encoders[name][0] for name in encodings]
+        if key == old_key and all(os.path.exists(path) for path in out_paths):
+            return relpath, None, None, None
+
+        # Same newline handling as reading the file in text mode
+        text = source.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        # Compressed copies from an earlier build would be served instead of the new page
+        for name, (extension, _) in encoders.items():
+            if name not in encodings and os.path.exists(out_path + extension):
+                os.remove(out_path + extension)
+        if encodings:
+            with CompressedWriter(out_path, encodings, level) as writer:
+                if len(text) > 0:
+                    compiler = Compiler(text, False, False, prettify, highlight=highlight)
+                    compiler.compile_to(writer, base_indent)
+            return relpath, key, None, writer.report()
+
+        # A failed compile mustn't leave a half written page behind
+        try:
+            with open(out_path + ".tmp", "wb") as file:
+                if len(text) > 0:
+                    compiler = Compiler(text, False, False, prettify, highlight=highlight)
+                    compiler.compile_to(file, base_indent)
+            os.replace(out_path + ".tmp", out_path)
+        except BaseException:
+            os.remove(out_path + ".tmp")
+            raise
+        return relpath, key, None, None
+    except Exception as e:
+        return relpath, None, f"{type(e).__name__}: {e}", None
+
+def load_manifest(dst_dir: str) -> dict:
+    try:
+        with open(os.path.join(dst_dir, manifest_name)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(dst_dir: str, manifest: dict) -> None:
+    path = os.path.join(dst_dir, manifest_name)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+# Compiles every .md file under @src_dir into @dst_dir, mirroring the
+# directory layout. Files that are unchanged since the last build (same
+# content and options, according to the manifest in @dst_dir) are skipped.
+# Returns (built, skipped, errors) where errors maps paths to messages.
+# With @encodings ("gzip", "deflate") every page is also written compressed
+# at zlib @level, ex: page.html.gz. @report, a dict, is then given the total
+# "sizes" of the pages that were built, by "html" or encoding, and the
+# "compress_seconds" spent compressing them.
+def build(src_dir: str, dst_dir: str, prettify: bool, base_indent: int, jobs=None,
+          highlight: bool = False, encodings=(), level: int = 6, report: dict = None) -> tuple:
+    os.makedirs(dst_dir, exist_ok=True)
+    manifest = load_manifest(dst_dir)
+    if report is None:
+        report = {}
+    report["sizes"] = {name: 0 for name in ("html", *encodings)}
+    report["compress_seconds"] = 0.0
+
+    sources = find_sources(src_dir)
+    tasks = [(src_dir, dst_dir, relpath, manifest.get(relpath), prettify, base_indent, highlight,
+              tuple(encodings), level)
+             for relpath in sources]
+
+    built, skipped, errors = 0, 0, {}
+    new_manifest = {}
+    with ProcessPoolExecutor(jobs) as pool:
+        chunksize = max(1, len(tasks) // ((jobs or os.cpu_count() or 1) * 8))
+        for relpath, key, error, page in pool.map(_build_file, tasks, chunksize=chunksize):
+            if page is not None:
+                for name, size in page["sizes"].items():
+                    report["sizes"][name] += size
+                report["compress_seconds"] += page["compress_seconds"]
+            if error is not None:
+                errors[relpath] = error
+            elif key is None:
+                skipped += 1
+                new_manifest[relpath] = manifest[relpath]
+            else:
+                built += 1
+                new_manifest[relpath] = key
+
+    save_manifest(dst_dir, new_manifest)
+    return built, skipped, errors
+
+def main(args) -> int:
+    encodings = [name for name in encoders if getattr(args, name)]
+    report = {}
+    built, skipped, errors = build(args.src, args.dst, args.prettify, args.base_indent,
+                                   args.jobs, args.highlight, encodings, args.level, report)
+    for relpath, error in sorted(errors.items()):
+        print(f"{relpath}: {error}", file=sys.stderr)
+    print(f"built {built}, unchanged {skipped}, failed {len(errors)}")
+    if encodings and built:
+        sizes = ", ".join(f"{name} {size} bytes" for name, size in report["sizes"].items())
+        print(f"{sizes}, {report['compress_seconds']:.2f}s compressing")
+    return 1 if errors else 0
@@ -0,0 +1,131 @@
+from mark.markdown import Compiler
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+
+# Identifies a source together with everything that changes its output
+def source_key(source: bytes, prettify: bool, base_indent: int, highlight: bool = False) -> str:
+    digest = hashlib.blake2b(source, digest_size=16)
+    digest.update(f"|{prettify}|{base_indent}".encode())
+    if highlight: # Keys from before highlighting existed stay the same
+        digest.update(b"|highlight")
+    return digest.hexdigest()
+
+# Persistent stores only need get(key) -> html or None and put(key, html)
+class SQLiteStore:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, html TEXT)")
+        self.db.commit()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.db.execute("SELECT html FROM pages WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key: str, html: str) -> None:
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?)", (key, html))
+            self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+class FileStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".html")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, html: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(html)
+        os.replace(temp, path)
+
+# Content addressed cache in front of Compiler. Pages are kept in memory up to
+# @max_bytes, least recently used first out. With a @store, pages that aren't
+# in memory are looked up there and everything compiled is written to it.
+class RenderCache:
+    def __init__(self, max_bytes: int, store=None):
+        self.max_bytes = max_bytes
+        self.store = store
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits, "store_hits": self.store_hits,
+            "misses": self.misses, "evictions": self.evictions,
+            "entries": len(self.entries), "bytes": self.size,
+        }
+
+    def get(self, key: str):
+        with self.lock:
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return html
+
+        if self.store is not None:
+            html = self.store.get(key)
+            if html is not None:
+                with self.lock:
+                    self.store_hits += 1
+                self._remember(key, html)
+                return html
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, html: str) -> None:
+        self._remember(key, html)
+        if self.store is not None:
+            self.store.put(key, html)
+
+    def _remember(self, key: str, html: str) -> None:
+        size = sys.getsizeof(html)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= sys.getsizeof(old)
+            self.entries[key] = html
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+                self.evictions += 1
+
+    def compile(self, source: str, prettify: bool, base_indent: int, highlight: bool = False) -> str:
+        key = source_key(source.encode("utf-8"), prettify, base_indent, highlight)
+        html = self.get(key)
+        if html is None:
+            html = Compiler(source, False, False, prettify, highlight=highlight).compile(base_indent)
+            self.put(key, html)
+        return html
@@ -0,0 +1,97 @@
+import os
+import time
+import zlib
+
+# The file extension and zlib window bits (which pick the container) of every
+# encoding a page can be precompressed with. The names are what goes in a
+# Content-Encoding header.
+encoders = {"gzip": (".gz", 31), "deflate": (".zz", 15)}
+
+# A sink (see output_generation.sink_writer) that writes html to @path and, as
+# it's written, a copy compressed with every one of @encodings next to it (ex:
+# page.html.gz), all in one pass. Fragments are gathered into chunks of about
+# @chunk_size characters, a chunk is all that's held onto. Everything is
+# written under temporary names that only replace @path and the others once
+# the writer is closed, and are removed if it's discarded instead (a with
+# block does either).
+#   sizes: bytes written to every file, by "html" or the encoding
+#   compress_seconds: time spent compressing
+class CompressedWriter:
+    # @level: zlib compression level, 1 (fastest) to 9 (smallest)
+    def __init__(self, path: str, encodings=("gzip",), level: int = 6, chunk_size: int = 1 << 16):
+        self.paths = {"html": path}
+        self.compressors = {}
+        for name in encodings:
+            if name not in encoders:
+                raise ValueError(f"Unknown encoding {name!r}, expected one of: {', '.join(encoders)}.")
+            extension, window_bits = encoders[name]
+            self.paths[name] = path + extension
+            self.compressors[name] = zlib.compressobj(level, zlib.DEFLATED, window_bits)
+        self.sizes = dict.fromkeys(self.paths, 0)
+        self.compress_seconds = 0.0
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.pending_size = 0
+
+        self.files = {}
+        try:
+            for name, final_path in self.paths.items():
+                self.files[name] = open(final_path + ".tmp", "wb")
+        except BaseException:
+            self.discard()
+            raise
+
+    def write(self, fragment: str) -> None:
+        self.pending.append(fragment)
+        self.pending_size += len(fragment)
+        if self.pending_size >= self.chunk_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        data = ''.join(self.pending).encode("utf-8")
+        self.pending.clear()
+        self.pending_size = 0
+        self._write("html", data)
+        start = time.perf_counter()
+        compressed = {name: compressor.compress(data) for name, compressor in self.compressors.items()}
+        self.compress_seconds += time.perf_counter() - start
+        for name, data in compressed.items():
+            self._write(name, data)
+
+    def _write(self, name: str, data: bytes) -> None:
+        if data:
+            self.files[name].write(data)
+            self.sizes[name] += len(data)
+
+    # Finishes every file and puts it in place
+    def close(self) -> None:
+        self._flush()
+        start = time.perf_counter()
+        endings = {name: compressor.flush() for name, compressor in self.compressors.items()}
+        self.compress_seconds += time.perf_counter() - start
+        for name, data in endings.items():
+            self._write(name, data)
+
+        for file in self.files.values():
+            file.close()
+        for name, file in self.files.items():
+            os.replace(file.name, self.paths[name])
+
+    # Removes the files instead, nothing replaces @path
+    def discard(self) -> None:
+        for file in self.files.values():
+            file.close()
+            os.remove(file.name)
+        self.files = {}
+
+    def report(self) -> dict:
+        return {"sizes": dict(self.sizes), "compress_seconds": self.compress_seconds}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback) -> None:
+        if error_type is None:
+            self.close()
+        else:
+            self.discard()
@@ -0,0 +1,32 @@
+# Everything mark raises because of its input is a MarkError
+class MarkError(Exception):
+    pass
+
+# Compiler was given an empty source. Also a ValueError, which is what it
+# used to raise.
+class EmptySourceError(MarkError, ValueError):
+    pass
+
+# The markup doesn't parse, ex: emphasis or a code block that's never closed
+class ParseError(MarkError):
+    pass
+
+# Data that isn't a precompiled document of this version, see serialize.py
+class FormatError(MarkError, ValueError):
+    pass
+
+# A limit from limits.Limits was hit
+class LimitExceeded(MarkError):
+    pass
+
+class InputTooLarge(LimitExceeded):
+    pass
+
+class TooManyTokens(LimitExceeded):
+    pass
+
+class NestingTooDeep(LimitExceeded):
+    pass
+
+class TimeLimitExceeded(LimitExceeded):
+    pass
@@ -0,0 +1,157 @@
+from collections import OrderedDict
+import re
+import sys
+import threading
+
+# Code is highlighted by wrapping what a language's pattern matches in spans,
+# the name of the group that matched is the span's class:
+#   keyword, builtin, string, number, comment, decorator (python),
+#   variable (shell), key (json) and preprocessor (c-like)
+def _words(words: str) -> str:
+    return r"\b(?:" + "|".join(words.split()) + r")\b"
+
+def _language(*groups) -> re.Pattern:
+    return re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in groups),
+                      re.MULTILINE)
+
+_python = _language(
+    ("comment", r"\#[^\n]*"),
+    ("string", r"(?:\b(?i:[rbuf]{1,2}))?(?:'''[\s\S]*?(?:'''|\Z)|\"\"\"[\s\S]*?(?:\"\"\"|\Z)"
+               r"|'(?:\\.|[^'\\\n])*'?|\"(?:\\.|[^\"\\\n])*\"?)"),
+    ("decorator", r"^[ \t]*@[\w.]+"),
+    ("keyword", _words("False None True and as assert async await break class continue "
+                       "def del elif else except finally for from global if import in is "
+                       "lambda nonlocal not or pass raise return try while with yield")),
+    ("builtin", _words("abs all any bool bytes dict enumerate filter float int isinstance "
+                       "iter len list map max min next object open print range repr "
+                       "reversed set sorted str sum super tuple type zip self")),
+    ("number", r"\b(?:0[xob][\da-fA-F_]+|\d[\d_]*\.?[\d_]*(?:[eE][+-]?\d+)?j?)"),
+)
+
+_shell = _language(
+    ("comment", r"(?<![^\s;])\#[^\n]*"),
+    ("string", r"'[^']*'?|\"(?:\\.|[^\"\\])*\"?"),
+    ("variable", r"\$(?:\{[^}\n]*\}?|\w+|[@#?$!*-])"),
+    ("keyword", _words("if then else elif fi for in do done while until case esac "
+                       "function return local export select break continue")),
+    ("builtin", _words("cd echo exit printf read set shift source test trap unset")),
+)
+
+_json = _language(
+    ("key", r"\"(?:\\.|[^\"\\\n])*\"(?=\s*:)"),
+    ("string", r"\"(?:\\.|[^\"\\\n])*\"?"),
+    ("number", r"-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?"),
+    ("keyword", _words("true false null")),
+)
+
+# One pattern for C and the languages that look like it
+_c_like = _language(
+    ("comment", r"//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)"),
+    ("preprocessor", r"^[ \t]*\#[ \t]*\w+"),
+    ("string", r"\"(?:\\.|[^\"\\\n])*\"?|'(?:\\.|[^'\\\n])*'?|`(?:\\.|[^`\\])*`?"),
+    ("keyword", _words("auto break case catch char class const continue default delete do "
+                       "double else enum extern false final float fn for func function go "
+                       "goto if impl import in int interface let long match mut namespace "
+                       "new null nullptr package private protected public return short "
+                       "signed sizeof static struct super switch this throw true try "
+                       "typedef typeof union unsigned use using var void volatile while")),
+    ("number", r"\b(?:0[xXbB][\da-fA-F']+|\d[\d']*\.?\d*(?:[eE][+-]?\d+)?)[uUlLfF]*"),
+)
+
+# Fence languages (lowercase) and the pattern each is highlighted with
+languages = {}
+for names, pattern in ((("python", "py"), _python),
+                       (("shell", "sh", "bash", "zsh", "console"), _shell),
+                       (("json",), _json),
+                       (("c", "h", "cpp", "c++", "cc", "hpp", "cs", "java", "javascript",
+                         "js", "typescript", "ts", "go", "rust", "rs", "swift", "kotlin"), _c_like)):
+    for name in names:
+        languages[name] = pattern
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _highlight(code: str, pattern: re.Pattern) -> str:
+    out = []
+    index = 0
+    for match in pattern.finditer(code):
+        start, end = match.span()
+        if start == end:
+            continue
+        out.append(_escape(code[index:start]))
+        out.append(f"<span class='{match.lastgroup}'>{_escape(code[start:end])}</span>")
+        index = end
+    out.append(_escape(code[index:]))
+    return ''.join(out)
+
+# Highlighted code by (language, code), kept up to @max_bytes with the least
+# recently used first out. The code is hashed by the dict like any str key,
+# it's kept as part of the key so two snippets can never collide, and counts
+# towards the size. Safe to share between threads.
+class HighlightCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "entries": len(self.entries), "bytes": self.size,
+        }
+
+    def get(self, key: tuple):
+        with self.lock:
+            html = self.entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key: tuple, html: str) -> None:
+        size = _size(key, html)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= _size(key, old)
+            self.entries[key] = html
+            self.size += size
+
+            while self.size > self.max_bytes:
+                evicted = self.entries.popitem(last=False)
+                self.size -= _size(*evicted)
+                self.evictions += 1
+
+def _size(key: tuple, html: str) -> int:
+    return sys.getsizeof(key[1]) + sys.getsizeof(html)
+
+# Shared by every OutputGenerator in the process
+shared_cache = HighlightCache(8 << 20)
+
+# Returns the html of @code highlighted as @language (the fence's language),
+# escaped like any other code. Returns None if the language isn't supported.
+# @cache: a HighlightCache, shared_cache by default
+def highlight(code: str, language: str, cache: HighlightCache = None):
+    language = language.strip().lower()
+    pattern = languages.get(language)
+    if pattern is None:
+        return None
+
+    if cache is None:
+        cache = shared_cache
+    key = (language, code)
+    html = cache.get(key)
+    if html is None:
+        html = _highlight(code, pattern)
+        cache.put(key, html)
+    return html
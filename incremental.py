@@ -0,0 +1,134 @@
+from mark.markdown import Compiler
+from mark.errors import MarkError
+from bisect import bisect
+import hashlib
+import re
+
+# Top level blocks always end at a blank line, unless a code block or an
+# unclosed inline element carries on past it (see Document.update). A newline
+# right after a backslash is escaped and doesn't end anything.
+_blank_lines = re.compile(r"(?<!\\)\n\n+")
+_fence = re.compile(r"^```", re.MULTILINE)
+
+# Splits the source into (start, end) spans of text between blank lines. The
+# blank lines at the end go with the last one, unclosed markup in it reads them.
+def split_blocks(source: str) -> list:
+    spans = []
+    start = 0
+    for match in _blank_lines.finditer(source):
+        end = match.start() + 1 # Keep the newline that ends the last line
+        if source[start:end].strip("\n"):
+            spans.append((start, end))
+        start = match.end()
+    if source[start:].strip("\n"):
+        spans.append((start, len(source)))
+    elif spans:
+        spans[-1] = (spans[-1][0], len(source))
+    return spans
+
+# Groups the blocks of @source (see split_blocks) into (start, end) spans of
+# whole blocks, a span ends at the first blank line after it's grown to @size.
+# With the default every blank line is a cut. Lists and blockquotes always end
+# at a blank line, code blocks don't, so blank lines after an odd number of
+# fences are skipped. The fences are only counted, whatever uses the spans has
+# to catch anything that still runs on past the end of one.
+def cut_blocks(source: str, size: float = 0) -> list:
+    blocks = split_blocks(source)
+    if len(blocks) == 0:
+        return []
+
+    fences = [match.start() for match in _fence.finditer(source)]
+    spans = []
+    start = blocks[0][0]
+    for (_, end), (next_start, _) in zip(blocks, blocks[1:]):
+        if end - start >= size and bisect(fences, end) % 2 == 0:
+            spans.append((start, end))
+            start = next_start
+    # The blank lines at the end too, unclosed markup in the last block reads them
+    spans.append((start, len(source)))
+    return spans
+
+# Whether @source has to be compiled in one piece for its html. The parser
+# looks back from the first token to the last one, which isn't a NEWLINE if
+# the source ends in a backslash (see lexer._finish), the first block depends
+# on the end of the source then.
+def needs_whole_compile(source: str) -> bool:
+    return source.endswith("\\")
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+# A long lived document for live previews. Every update only compiles the
+# blocks whose text changed, the html of the others is reused.
+class Document:
+    def __init__(self, prettify: bool, base_indent: int, source: str = ""):
+        self.prettify = prettify
+        self.base_indent = base_indent
+        self.source = ""
+        self.blocks = [] # (key, html) for each block, in order
+        self.failing = set() # Keys of text that can't be compiled on its own
+        if source:
+            self.update(source)
+
+    @property
+    def html(self) -> str:
+        return ''.join(html for _, html in self.blocks)
+
+    # Replaces source[start:end] with @text
+    def edit(self, start: int, end: int, text: str):
+        return self.update(self.source[:start] + text + self.source[end:])
+
+    # Returns (start, old_end, new_end): the blocks that were at [start:old_end]
+    # have been replaced by the ones now at [start:new_end]. None if nothing changed.
+    def update(self, source: str):
+        cache = dict(self.blocks)
+        failing = set()
+        blocks = []
+
+        spans = [(0, len(source))] if needs_whole_compile(source) else split_blocks(source)
+        i = 0
+        while i < len(spans):
+            start = spans[i][0]
+            # A block that fails on its own runs into the next one (an unclosed
+            # code block or emphasis), so they're compiled together.
+            for j in range(i, len(spans)):
+                text = source[start:spans[j][1]]
+                key = _key(text)
+                html = cache.get(key)
+                last = j == len(spans) - 1
+                if html is None and (last or key not in self.failing):
+                    try:
+                        html = Compiler(text, False, False, self.prettify).compile(self.base_indent)
+                    except MarkError:
+                        if last:
+                            # What's left can depend on the blocks before it (ex: it
+                            # ends in an escaped newline), the whole document is one
+                            # block then, or raises what Compiler does
+                            blocks.clear()
+                            key = _key(source)
+                            html = Compiler(source, False, False, self.prettify).compile(self.base_indent)
+                if html is not None:
+                    break
+                failing.add(key)
+
+            cache[key] = html
+            blocks.append((key, html))
+            i = j + 1
+
+        old = [key for key, _ in self.blocks]
+        new = [key for key, _ in blocks]
+        self.source = source
+        self.blocks = blocks
+        self.failing = failing
+
+        start = 0
+        while start < min(len(old), len(new)) and old[start] == new[start]:
+            start += 1
+        old_end, new_end = len(old), len(new)
+        while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+
+        if start == old_end and start == new_end:
+            return None
+        return start, old_end, new_end
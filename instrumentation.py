@@ -0,0 +1,61 @@
+from mark.lexer import token_names
+from mark.parser import node_names
+from collections import Counter
+import time
+
+# Receives timings and counts from a Compiler. Every hook does nothing by
+# default, subclass it and override the ones you need.
+#   stage:  "lex", "parse", "render" (or "load", see Compiler.from_ast) and
+#           how long it took in seconds, "compress" as well for compressed
+#           output (see Compiler.compile_to_file)
+#   record: "bytes_in", "bytes_out", "max_depth" (ints) or
+#           "tokens", "nodes" (counts by type), "bytes_compressed" (by encoding)
+class Tracer:
+    def stage(self, name: str, seconds: float) -> None:
+        pass
+
+    def record(self, name: str, value) -> None:
+        pass
+
+# Keeps everything it's given, ex: to export per document latencies
+class MetricsTracer(Tracer):
+    def __init__(self):
+        self.stages = {}
+        self.values = {}
+
+    def stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record(self, name: str, value) -> None:
+        self.values[name] = value
+
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+def count_tokens(tokens: list) -> dict:
+    counts = Counter(token.kind for token in tokens)
+    return {token_names[kind]: count for kind, count in counts.items()}
+
+# Returns (count of nodes by type, deepest nesting level)
+def count_nodes(document: list) -> tuple:
+    counts = Counter()
+    max_depth = 0
+    stack = [(node, 1) for node in document]
+    while stack:
+        node, depth = stack.pop()
+        counts[node.kind] += 1
+        max_depth = max(max_depth, depth)
+        stack.extend((child, depth + 1) for child in node.children)
+    return {node_names[kind]: count for kind, count in counts.items()}, max_depth
+
+# Stands in for a sink and counts the utf-8 bytes written through it
+class CountingSink:
+    def __init__(self, write):
+        self._write = write
+        self.count = 0
+
+    def write(self, fragment: str) -> None:
+        self.count += len(fragment.encode("utf-8"))
+        self._write(fragment)
+
+clock = time.perf_counter
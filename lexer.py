@@ -1,81 +1,339 @@
-                
-mappings = {
-    "#":  "HASH",
-    "-":  "HYPHEN",
-    "+":  "PLUS",
-    "*":  "ASTRIX",
-    "`":  "BACKTICK",
-    "!":  "EXCLAMATION",
-    "[":  "OPEN BACKET",
-    "]":  "CLOSED BRACKET",
-    "(":  "OPEN PARENTHESES",
-    ")":  "CLOSED PARENTHESES",
-    "<":  "OPEN ANGLER BRACKET",
-    ">":  "CLOSED ANGLER BRACKET",
-    "\r": "CARRIAGE RETURN",
-    "\n": "NEWLINE",
-    "\t": "TAB"
-}
-
-class Token:
-    def __init__(self, token_type: str, raw: str):
-        self.type = token_type
-        self.raw = raw
-
-    def debug(self):
-        print(f"{self.type}  ->  {self.raw}")
-
-class Lexer:
-    def __init__(self, source: str, should_debug: bool):
-        source = source.replace(" " * 4, "\t")
-        source = source.replace(" " * 2, "\r")
-        source = source.replace(" & ", "&amp;")
-        source = source.replace("&<", "&lt;")
-        source = source.replace("&>", "&gt;")
-        self.source = list(source)
-
-        self.tokens = []
-        self.index = -1
-        self._tokenize()
-        
-        self.should_debug = should_debug
-        self.debug()
-
-    def debug(self) -> None:
-        if self.should_debug:
-            for i in self.tokens:
-                i.debug()
-            print("\n", "=" * 25, end="\n\n")
-
-    def _read(self, amount=1) -> str:
-        stop = self.index + amount
-        stream = []
-        while self.index < stop:
-            self.index += 1
-            
-            if self.index >= len(self.source):
-                break
-
-            stream.append(self.source[self.index])
-        return ''.join(stream)
-
-    def _tokenize(self) -> None:
-        if self.source[-1] != "\n":
-            self.source.append("\n")
-
-        text_buffer = ""
-        while self.index < len(self.source):
-            char = self._read()
-
-            if char == "\\":
-                char = self._read()
-
-            # Is a keyword and is not escaped.
-            if char in mappings.keys() and self.source[self.index - 1] != "\\":
-                if len(text_buffer) > 0:
-                    self.tokens.append(Token("TEXT", text_buffer))
-                    text_buffer = ""
-
-                self.tokens.append(Token(mappings[char], char))
-            else:
-                text_buffer += char
+from mark.errors import InputTooLarge, TooManyTokens
+from mark.limits import no_limits, check_deadline
+import re
+import sys
+
+mappings = {
+    "#":  "HASH",
+    "-":  "HYPHEN",
+    "+":  "PLUS",
+    "*":  "ASTRIX",
+    "`":  "BACKTICK",
+    "!":  "EXCLAMATION",
+    "[":  "OPEN BACKET",
+    "]":  "CLOSED BRACKET",
+    "(":  "OPEN PARENTHESES",
+    ")":  "CLOSED PARENTHESES",
+    "<":  "OPEN ANGLER BRACKET",
+    ">":  "CLOSED ANGLER BRACKET",
+    "\r": "CARRIAGE RETURN",
+    "\n": "NEWLINE",
+    "\t": "TAB"
+}
+
+# Jumps straight to the next character that isn't plain text. Runs of spaces
+# are indentation (4 spaces make a tab, 2 a carriage return) and an ampersand
+# in front of an angle bracket turns it into an entity. An escaped backslash
+# also swallows a keyword right after it, so `\\*` stays text.
+_special = re.compile(r"""
+    \\\\(?:[#\-+*`!\[\]()<>\r\n\t]|\ {4}|\ {2})?  # escaped backslash (and the keyword it hides)
+  | \\(?:&[<>]?|\ {4}|\ {2}|[\s\S])                 # any other escaped character
+  | &[<>]                                            # entity
+  | \ {2,}                                           # indentation
+  | [#\-+*`!\[\]()<>\r\n\t]                          # keyword
+""", re.VERBOSE)
+# The same over utf-8 bytes. None of the characters above can be part of a
+# multi byte character, so it never splits one.
+_special_bytes = re.compile(_special.pattern.encode(), re.VERBOSE)
+_escape = re.compile(r"\\([\s\S])")
+
+# Applies the substitutions the scanner accounts for to a span of text
+def _substitute(text: str) -> str:
+    text = text.replace(" " * 4, "\t")
+    text = text.replace(" " * 2, "\r")
+    return _substitute_entities(text)
+
+def _substitute_entities(text: str) -> str:
+    text = text.replace(" & ", "&amp;")
+    text = text.replace("&<", "&lt;")
+    return text.replace("&>", "&gt;")
+
+# Token types are small ints, token_names maps them back to the names above
+(HASH, HYPHEN, PLUS, ASTRIX, BACKTICK, EXCLAMATION, OPEN_BRACKET, CLOSED_BRACKET,
+ OPEN_PARENTHESES, CLOSED_PARENTHESES, OPEN_ANGLER_BRACKET, CLOSED_ANGLER_BRACKET,
+ CARRIAGE_RETURN, NEWLINE, TAB, TEXT, CODE) = range(17)
+token_names = list(mappings.values()) + ["TEXT", "CODE"]
+
+class Token:
+    __slots__ = ("kind", "raw")
+
+    def __init__(self, kind: int, raw: str):
+        self.kind = kind
+        self.raw = raw
+
+    # The type's name, for code that predates the int kinds
+    @property
+    def type(self) -> str:
+        return token_names[self.kind]
+
+    def debug(self):
+        print(f"{self.type}  ->  {self.raw}")
+
+# What the characters of a TEXT token read as
+def _text(text: str, escaped: bool) -> str:
+    if escaped:
+        # Escapes apply to the substituted text, `\    ` escapes a tab
+        return _escape.sub(r"\1", _substitute(text))
+    elif "&" in text:
+        return _substitute_entities(text)
+    return text
+
+# A TEXT token that points at its characters in the source instead of copying them
+class TextToken:
+    __slots__ = ("source", "start", "end", "escaped")
+    kind = TEXT
+    type = "TEXT"
+
+    def __init__(self, source: str, start: int, end: int, escaped: bool):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.escaped = escaped
+
+    @property
+    def raw(self) -> str:
+        return _text(self.source[self.start:self.end], self.escaped)
+
+    debug = Token.debug
+
+# A TEXT token in utf-8 bytes or a memory map of them, it's only decoded when read
+class BytesTextToken(TextToken):
+    __slots__ = ()
+
+    @property
+    def raw(self) -> str:
+        return _text(self.source[self.start:self.end].decode("utf-8"), self.escaped)
+
+# The code of a fenced code block, from the line after the opening fence up to
+# the closing one, in place of the tokens it would otherwise be lexed into.
+# Reading it gives what those tokens' raw strings would join into.
+class CodeToken:
+    __slots__ = ("source", "start", "end")
+    kind = CODE
+    type = "CODE"
+
+    def __init__(self, source, start: int, end: int):
+        self.source = source
+        self.start = start
+        self.end = end
+
+    def _text(self) -> str:
+        return self.source[self.start:self.end]
+
+    @property
+    def raw(self) -> str:
+        # Spaces and entities are substituted like in text, and every backslash
+        # in the code starts an escape
+        text = _substitute(self._text())
+        if "\\" in text:
+            text = _escape.sub(r"\1", text)
+        return text
+
+    # The code itself, without the newline before the closing fence
+    @property
+    def code(self) -> str:
+        return self.raw[:-1]
+
+    debug = Token.debug
+
+class BytesCodeToken(CodeToken):
+    __slots__ = ()
+
+    def _text(self) -> str:
+        return self.source[self.start:self.end].decode("utf-8")
+
+# Keywords carry no data of their own, so every occurence shares one token
+keywords = {char: Token(kind, char) for kind, char in enumerate(mappings)}
+_keywords_by_byte = {char.encode(): token for char, token in keywords.items()}
+
+# What _scan and _finish need to read a str source, or a bytes like one
+_str_syntax = (_special.search, keywords, TextToken, "\\", " ", "\n",
+               CodeToken, "```", "<")
+_bytes_syntax = (_special_bytes.search, _keywords_by_byte, BytesTextToken, b"\\", b" ", b"\n",
+                 BytesCodeToken, b"```", b"<")
+
+# Where the code of a code block that opens with the line at @line_start ends,
+# if it can be a single CodeToken (-1 if not). Its tokens have to be what the
+# parser reads a code block's code from: everything up to the first backtick,
+# where the closing fence starts a line. A < on the opening line is left alone,
+# a reference skips over the token after it without reading it.
+def _code_end(source, line_start: int, code_start: int, syntax: tuple) -> int:
+    backslash, newline, fence, less_than = syntax[3], syntax[5], syntax[7], syntax[8]
+    if source.find(less_than, line_start, code_start) != -1:
+        return -1
+    end = source.find(fence[:1], code_start)
+    if end == code_start:
+        return end
+    # The newline before the closing fence has to be a NEWLINE, not escaped
+    if end != -1 and source[end - 1:end] == newline and source[end - 2:end - 1] != backslash:
+        return end
+    return -1
+
+# Tokenizes source[index:] into `tokens`. Returns where the text that no
+# keyword has closed off yet starts, and whether it contains escapes.
+# @source: a str, or utf-8 bytes or anything else re can search like them (ex: an mmap)
+# @check: called with `tokens` once there are more than the number of them it
+#         last returned, to enforce limits
+# @code: lex the code of fenced code blocks into a CodeToken each (see _code_end),
+#        @index has to be the start of a line
+def _scan(source, tokens: list, index: int, text_start: int, escaped: bool, check=None,
+          code: bool = False) -> tuple:
+    syntax = _str_syntax if isinstance(source, str) else _bytes_syntax
+    search, by_char, text_token, backslash, space = syntax[:5]
+    code_token, fence = syntax[6], syntax[7]
+    newline = keywords["\n"]
+    line_start = index # Of the line being scanned
+    closed_at = -1 # Start of the last closing fence, it doesn't open a code block
+    check_at = sys.maxsize if check is None else check(tokens)
+    match = search(source, index)
+    while match is not None:
+        if len(tokens) > check_at:
+            check_at = check(tokens)
+        start, index = match.span()
+        char = source[start:start + 1]
+        keyword = by_char.get(char)
+        if keyword is not None:
+            if text_start < start:
+                tokens.append(text_token(source, text_start, start, escaped))
+                escaped = False
+            tokens.append(keyword)
+            text_start = index
+            if keyword is newline:
+                if code and line_start != closed_at and source[line_start:line_start + 3] == fence:
+                    end = _code_end(source, line_start, index, syntax)
+                    if end != -1:
+                        tokens.append(code_token(source, index, end))
+                        index = text_start = closed_at = end
+                line_start = index
+        elif char == backslash:
+            # Escaped characters are part of the surrounding text
+            escaped = True
+        elif char == space:
+            if text_start < start:
+                tokens.append(text_token(source, text_start, start, escaped))
+                escaped = False
+            width = index - start
+            tokens.extend([keywords["\t"]] * (width // 4))
+            if width % 4 >= 2:
+                tokens.append(keywords["\r"])
+            # An odd space out is ordinary text
+            text_start = index - width % 2
+        match = search(source, index)
+    return text_start, escaped
+
+# The source is always treated as ending with a newline. Text is only flushed
+# by a keyword, so if that newline is escaped the text is dropped.
+def _finish(source, tokens: list, text_start: int, escaped: bool) -> None:
+    syntax = _str_syntax if isinstance(source, str) else _bytes_syntax
+    text_token, backslash, newline = syntax[2], syntax[3], syntax[5]
+    last = source[-1:]
+    if last != newline and last != backslash:
+        if text_start < len(source):
+            tokens.append(text_token(source, text_start, len(source), escaped))
+        tokens.append(keywords["\n"])
+
+# Lexes the code in every CodeToken of @tokens into ordinary tokens
+def expand_code(tokens: list) -> list:
+    expanded = []
+    for token in tokens:
+        if token.kind == CODE:
+            # The code always ends with a NEWLINE, there's no text left over
+            _scan(token.source[token.start:token.end], expanded, 0, 0, False)
+        else:
+            expanded.append(token)
+    return expanded
+
+# Lazily tokenizes an iterable of chunks, a line never has to be complete
+# within one chunk. Nothing but unfinished lines is held onto between chunks.
+# @limits: a limits.Limits like Lexer's, its time runs out at @deadline if given
+#          and includes waiting for the chunks
+def tokenize_chunks(chunks, limits=no_limits, deadline=None):
+    max_size = sys.maxsize if limits.max_size is None else limits.max_size
+    max_tokens = sys.maxsize if limits.max_tokens is None else limits.max_tokens
+    deadline = limits.deadline() if deadline is None else deadline
+    size = 0
+    count = 0 # Tokens yielded so far
+
+    # Every few thousand tokens, see _scan
+    def check_limits(tokens: list) -> int:
+        if count + len(tokens) > max_tokens:
+            raise TooManyTokens(f"Markdown source has more than {max_tokens} tokens.")
+        check_deadline(deadline)
+        return min(max_tokens - count, len(tokens) + 4096)
+    check = None
+    if limits.max_tokens is not None or limits.max_seconds is not None:
+        check = check_limits
+
+    parts = []
+    index = 0
+    escaped = False
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_size:
+            raise InputTooLarge(f"Markdown source is longer than {max_size}, the limit.")
+        end = chunk.rfind("\n") + 1
+        if end == 0:
+            parts.append(chunk)
+            check_deadline(deadline) # Chunks that finish no line are never scanned
+            continue
+
+        parts.append(chunk[:end])
+        source = ''.join(parts)
+        tokens = []
+        text_start, escaped = _scan(source, tokens, index, 0, escaped, check)
+        if check is not None:
+            check(tokens)
+        count += len(tokens)
+        yield from tokens
+
+        # Text that runs through an escaped newline continues in the next chunk
+        parts = [source[text_start:], chunk[end:]]
+        index = len(source) - text_start
+
+    source = ''.join(parts)
+    if source:
+        tokens = []
+        text_start, escaped = _scan(source, tokens, index, 0, escaped, check)
+        _finish(source, tokens, text_start, escaped)
+        if check is not None:
+            check(tokens)
+        yield from tokens
+
+# @source: a str, or utf-8 bytes, see _scan
+# @limits: a limits.Limits, the time it has runs out at @deadline if given
+class Lexer:
+    def __init__(self, source, should_debug: bool, limits=no_limits, deadline=None):
+        self.source = source
+        self.limits = limits
+        self.deadline = limits.deadline() if deadline is None else deadline
+        if limits.max_size is not None and len(source) > limits.max_size:
+            raise InputTooLarge(f"Markdown source is {len(source)} long, "
+                                f"the limit is {limits.max_size}.")
+
+        self.tokens = []
+        check = None
+        if limits.max_tokens is not None or limits.max_seconds is not None:
+            check = self._check
+        text_start, escaped = _scan(source, self.tokens, 0, 0, False, check, code=True)
+        _finish(source, self.tokens, text_start, escaped)
+        if check is not None:
+            check(self.tokens)
+
+        self.should_debug = should_debug
+        self.debug()
+
+    # Every few thousand tokens, see _scan
+    def _check(self, tokens: list) -> int:
+        max_tokens = self.limits.max_tokens
+        if max_tokens is None:
+            max_tokens = sys.maxsize
+        elif len(tokens) > max_tokens:
+            raise TooManyTokens(f"Markdown source has more than {max_tokens} tokens.")
+        check_deadline(self.deadline)
+        return min(max_tokens, len(tokens) + 4096)
+
+    def debug(self) -> None:
+        if self.should_debug:
+            for i in self.tokens:
+                i.debug()
+            print("\n", "=" * 25, end="\n\n")
@@ -0,0 +1,33 @@
+from mark.errors import TimeLimitExceeded
+import math
+import time
+
+# Bounds on the work a single compile can do, for input that can't be trusted.
+# Each one is None for no limit, every limit that's hit raises a subclass of
+# errors.LimitExceeded.
+#   max_size:    characters in the source (bytes for a bytes source)
+#   max_tokens:  tokens the lexer produces
+#   max_depth:   how deep blocks (blockquotes, lists and list indentation) and
+#                the inline elements in them can nest
+#   max_seconds: wall time for lexing and parsing
+class Limits:
+    def __init__(self, max_size=None, max_tokens=None, max_depth=None, max_seconds=None):
+        self.max_size = max_size
+        self.max_tokens = max_tokens
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+
+    # Starts the clock on max_seconds, returns when time runs out
+    def deadline(self) -> float:
+        if self.max_seconds is None:
+            return math.inf
+        return time.monotonic() + self.max_seconds
+
+def check_deadline(deadline: float) -> None:
+    if time.monotonic() > deadline:
+        raise TimeLimitExceeded("Ran out of time compiling the markdown source.")
+
+no_limits = Limits()
+
+# Limits for markdown submitted by users, roughly what a long article needs
+untrusted = Limits(max_size=1_000_000, max_tokens=500_000, max_depth=64, max_seconds=2.0)
@@ -1,22 +1,222 @@
-from mark.lexer import Lexer
-from mark.parser import Parser
-from mark.output_generation import OutputGenerator
-import sys
+from mark.lexer import Lexer, tokenize_chunks
+from mark.parser import Parser, StreamingParser
+from mark.output_generation import (OutputGenerator, HtmlRenderer, TextRenderer,
+                                     JsonRenderer, sink_writer, walk)
+from mark.errors import EmptySourceError
+from mark.limits import no_limits
+from mark.compression import CompressedWriter
+from mark import instrumentation, serialize
+from functools import partial
+import mmap
+import os
 
 class Compiler:
-    def __init__(self, markdown_source: str, debug_lexer: bool, 
-                       debug_parser: bool, prettify: bool):
+    # @markdown_source: a str, or utf-8 bytes (see from_path)
+    # @tracer: an instrumentation.Tracer that's told how long each stage took
+    #          and what went through it.
+    # @highlight: highlight code blocks, see highlighting.py
+    # @limits: a limits.Limits on lexing and parsing, ex: limits.untrusted for
+    #          markdown from users. Everything raised for bad input (empty,
+    #          malformed or over a limit) is an errors.MarkError.
+    def __init__(self, markdown_source, debug_lexer: bool,
+                       debug_parser: bool, prettify: bool, tracer=None, highlight: bool = False,
+                       limits=no_limits):
         self.source = markdown_source
         if len(self.source) == 0:
-            sys.exit("Length of markdown source is zero.")
+            raise EmptySourceError("Length of markdown source is zero.")
 
-        self.lexer = Lexer(self.source, debug_lexer)
-        self.parser = Parser(self.lexer.tokens, debug_parser)
-        self.output_gen = OutputGenerator(self.parser.document, prettify)
+        self.tracer = tracer
+        deadline = limits.deadline()
+        if tracer is None:
+            self.lexer = Lexer(self.source, debug_lexer, limits, deadline)
+            self.parser = Parser(self.lexer.tokens, debug_parser, limits, deadline)
+        else:
+            self._traced_parse(debug_lexer, debug_parser, limits, deadline)
+        self.output_gen = OutputGenerator(self.parser.document, prettify, highlight)
+
+    # Compiles the file at @path without reading it into memory. It's memory
+    # mapped and lexed as utf-8 bytes, only the text that ends up in the html
+    # is decoded. A file with \r in it is decoded up front instead, with its
+    # newlines translated like a file opened in text mode.
+    @classmethod
+    def from_path(cls, path: str, debug_lexer: bool, debug_parser: bool,
+                  prettify: bool, tracer=None, highlight: bool = False, limits=no_limits):
+        with open(path, "rb") as file:
+            source = b""
+            if os.fstat(file.fileno()).st_size > 0:
+                source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if source.find(b"\r") != -1:
+            text = source[:].decode("utf-8")
+            source.close()
+            source = text.replace("\r\n", "\n").replace("\r", "\n")
+        return cls(source, debug_lexer, debug_parser, prettify, tracer, highlight, limits)
+
+    # Skips lexing and parsing, @ast is a document from serialize.dumps (or
+    # the list of nodes itself) that's rendered as is. There's no source, so
+    # `source`, `lexer` and `parser` are None.
+    @classmethod
+    def from_ast(cls, ast, prettify: bool, tracer=None, highlight: bool = False):
+        self = cls.__new__(cls)
+        self.source = self.lexer = self.parser = None
+        self.tracer = tracer
+
+        start = instrumentation.clock()
+        document = ast if isinstance(ast, list) else serialize.loads(ast)
+        if tracer is not None:
+            tracer.stage("load", instrumentation.clock() - start)
+            nodes, max_depth = instrumentation.count_nodes(document)
+            tracer.record("nodes", nodes)
+            tracer.record("max_depth", max_depth)
+
+        self.output_gen = OutputGenerator(document, prettify, highlight)
+        return self
+
+    # The parsed document in the format from_ast loads
+    def dump_ast(self) -> bytes:
+        return serialize.dumps(self.output_gen.ast)
+
+    def _traced_parse(self, debug_lexer: bool, debug_parser: bool, limits, deadline: float):
+        clock, tracer = instrumentation.clock, self.tracer
+        start = clock()
+        self.lexer = Lexer(self.source, debug_lexer, limits, deadline)
+        lexed = clock()
+        self.parser = Parser(self.lexer.tokens, debug_parser, limits, deadline)
+        tracer.stage("lex", lexed - start)
+        tracer.stage("parse", clock() - lexed)
+
+        source = self.source
+        tracer.record("bytes_in", len(source.encode("utf-8") if isinstance(source, str) else source))
+        tracer.record("tokens", instrumentation.count_tokens(self.lexer.tokens))
+        nodes, max_depth = instrumentation.count_nodes(self.parser.document)
+        tracer.record("nodes", nodes)
+        tracer.record("max_depth", max_depth)
 
     def compile(self, base_indent: int) -> str:
-        return self.output_gen.compile(base_indent)
+        if self.tracer is None:
+            return self.output_gen.compile(base_indent)
+
+        start = instrumentation.clock()
+        html = self.output_gen.compile(base_indent)
+        self.tracer.stage("render", instrumentation.clock() - start)
+        self.tracer.record("bytes_out", len(html.encode("utf-8")))
+        return html
+
+    # See output_generation.sink_writer for what @sink can be
+    def compile_to(self, sink, base_indent: int):
+        if self.tracer is None:
+            return self.output_gen.render(sink, base_indent)
+
+        sink = instrumentation.CountingSink(sink_writer(sink))
+        start = instrumentation.clock()
+        self.output_gen.render(sink, base_indent)
+        self.tracer.stage("render", instrumentation.clock() - start)
+        self.tracer.record("bytes_out", sink.count)
+
+    # Renders the document to every one of @formats ("html", "text" and "json",
+    # see output_generation) in a single walk of it. Returns {format: output}.
+    def compile_formats(self, base_indent: int, formats=("html", "text", "json")) -> dict:
+        outputs = {format: [] for format in formats}
+        renderers = []
+        for format, out in outputs.items():
+            if format == "html":
+                renderers.append(self.output_gen.renderer(out.append, base_indent))
+            elif format == "text":
+                renderers.append(TextRenderer(out.append))
+            elif format == "json":
+                renderers.append(JsonRenderer(out.append))
+            else:
+                raise ValueError(f"Unknown output format: {format}")
+
+        start = instrumentation.clock()
+        walk(self.output_gen.ast, renderers)
+        if self.tracer is not None:
+            self.tracer.stage("render", instrumentation.clock() - start)
+        return {format: ''.join(out) for format, out in outputs.items()}
+
+    # With @encodings ("gzip", "deflate", see compression.py) a compressed copy
+    # of the html is written along with it, ex: page.html.gz, at zlib @level.
+    # Returns compression.CompressedWriter.report() then, the sizes of the files
+    # and the time spent compressing (which the tracer's render stage includes).
+    def compile_to_file(self, filename: str, base_indent: int, encodings=(), level: int = 6):
+        if not encodings:
+            with open(filename, "w") as file:
+                self.compile_to(file, base_indent)
+            return None
+
+        with CompressedWriter(filename, encodings, level) as writer:
+            self.compile_to(writer, base_indent)
+        if self.tracer is not None:
+            self.tracer.stage("compress", writer.compress_seconds)
+            self.tracer.record("bytes_compressed", {name: size for name, size in writer.sizes.items()
+                                                    if name != "html"})
+        return writer.report()
+
+# A compiler that's configured once and then shared, ex: by the threads of a
+# worker pool. Nothing about a document is kept on it, every call lexes,
+# parses and renders into objects of its own, so calls can run at the same
+# time from any number of threads. The only state shared between them is the
+# highlighting cache, which has a lock.
+class Markdown:
+    # See Compiler for @limits and @highlight
+    def __init__(self, prettify: bool, base_indent: int = 0, limits=no_limits,
+                 highlight: bool = False):
+        self.prettify = prettify
+        self.base_indent = base_indent
+        self.limits = limits
+        self.highlight = highlight
+
+    # Returns the parsed document (Parser.document) of @source
+    def parse(self, source) -> list:
+        if len(source) == 0:
+            raise EmptySourceError("Length of markdown source is zero.")
+        deadline = self.limits.deadline()
+        tokens = Lexer(source, False, self.limits, deadline).tokens
+        return Parser(tokens, False, self.limits, deadline).document
+
+    def compile(self, source) -> str:
+        out = []
+        self.compile_to(source, out)
+        return ''.join(out)
+
+    # See output_generation.sink_writer for what @sink can be
+    def compile_to(self, source, sink) -> None:
+        renderer = HtmlRenderer(sink_writer(sink), self.prettify, self.base_indent, self.highlight)
+        walk(self.parse(source), [renderer])
+
+    # Returns the html of every one of @sources, in order. With an @executor
+    # (ex: a concurrent.futures.ThreadPoolExecutor) they're compiled on it.
+    def compile_many(self, sources, executor=None) -> list:
+        if executor is None:
+            return [self.compile(source) for source in sources]
+        return list(executor.map(self.compile, sources))
+
+# Compiles markdown as it's read, yielding the html of each top level block
+# once it's complete. @source: a file object or any iterable of strings.
+# @limits: see Compiler, max_seconds counts from the first block asked for and
+#          includes the time spent reading @source
+def compile_stream(source, prettify: bool, base_indent: int, highlight: bool = False,
+                   limits=no_limits):
+    output_gen = OutputGenerator([], prettify, highlight)
+    for block in _stream_blocks(source, limits):
+        yield output_gen.output(block, base_indent)
+
+# Like compile_stream, but each block is written to @sink as it's rendered.
+# See output_generation.sink_writer for what @sink can be.
+def compile_stream_to(source, sink, prettify: bool, base_indent: int, highlight: bool = False,
+                      limits=no_limits):
+    output_gen = OutputGenerator([], prettify, highlight)
+    write = sink_writer(sink)
+    for block in _stream_blocks(source, limits):
+        output_gen.write(block, base_indent, write)
+
+def compile_stream_to_file(source, filename: str, prettify: bool, base_indent: int,
+                           highlight: bool = False, limits=no_limits):
+    with open(filename, "w") as file:
+        compile_stream_to(source, file, prettify, base_indent, highlight, limits)
 
-    def compile_to_file(self, filename: str, base_indent: int):
-        with open(filename, "w") as file:
-            file.write(self.output_gen.compile(base_indent))
+def _stream_blocks(source, limits):
+    if hasattr(source, "read"):
+        source = iter(partial(source.read, 1 << 16), "")
+    deadline = limits.deadline()
+    return StreamingParser(tokenize_chunks(source, limits, deadline), limits, deadline).blocks()
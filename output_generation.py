@@ -1,101 +1,333 @@
-from mark.parser import Node
-
-tags = {
-    "HORIZANTAL RULE": "<hr>",
-    "PARAGRAPH": "<p>",
-    "BOLD": "<strong>",
-    "ITALIC": "<em>",
-    "MONOSPACE": "<code>",
-    "CODEBLOCK": "<code>",
-    "UNORDERED LIST": "<ul>",
-    "ORDERED LIST": "<ol>",
-    "LIST ITEM": "<li>",
-    "CODEBLOCK": "<code>",
-    "BLOCKQUOTE": "<blockquote>",
-    "HEADER": lambda level: f"<h{level}>",
-    "LINK": lambda href: f"<a href='{href}'>",
-    "IMAGE": lambda path, alt: f"<img src='{path}' alt='{alt}' title='{alt}'>"
-}
-
-class OutputGenerator:
-    def __init__(self, ast: list, should_prettify_html: bool):
-        self.ast = ast
-        self.html_output = ""
-        self.prettify = should_prettify_html
-
-    def url_builder(self, url_str: str) -> str:
-        if "https://" not in url_str or "http://" not in url_str:
-            url_str = f"https://{url_str}"
-        url_str = url_str.replace("\\", "/")
-        return url_str
-
-    def output(self, node: Node, indent: int) -> str:
-        insert_indent = lambda: (" " * 4) * indent if self.prettify else ""
-        closing_stack = []
-        out = insert_indent()
-
-        if node.type == "TEXT":
-            text = node.element_data['value']
-            out += text
-
-        elif node.type == "HEADER":
-            t = tags['HEADER'](node.element_data['level'])
-            out += t
-            closing_stack.append(t[0] + "/" + t[1:])
-
-        elif node.type == "LINK":
-            url = self.url_builder(node.element_data['href'])
-            out += tags['LINK'](url)
-            closing_stack.append("</a>")
-
-        elif node.type == "IMAGE":
-            out += tags['IMAGE'](node.element_data['path'], node.element_data['alt'])
-
-        elif node.type == "REFERENCE":
-            url = node.children[0].element_data['value']
-            out += f"<a href='{url}'>"
-            closing_stack.append("</a>")
-
-        elif node.type == "CODEBLOCK":
-            out += "<pre>\n" + insert_indent() + "<code>\n"
-            code = node.children[0].element_data['value']
-            code = code.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-            code = code.replace("\t", "    ").split("\n")
-
-            for i in code:
-                out += insert_indent()
-                out += i
-                out += "\n"
-
-            # Remove the extra \n
-            out = ''.join(list(out)[:len(list(out)) - 1])
-
-            closing_stack.append("</code>")
-            closing_stack.append("</pre>")
-        elif node.type == "HORIZANTAL RULE":
-            out += "<hr/>"
-        else:
-            t = tags[node.type]
-            out += t
-            closing_stack.append(''.join(t[0] + "/" + t[1:]))
-        
-        out += "\n" if self.prettify else ""
-
-        if node.type != "CODEBLOCK":
-            for n in node.children:
-                out += self.output(n, indent + 1)
-
-        for i in closing_stack:
-            out += insert_indent()
-            out += i
-            out += "\n" if self.prettify else ""
-
-        return out
-
-    # @base_indent: int -> Perhaps useful if embedding in existing html that's
-    #                      already tabbed.
-    def compile(self, base_indent: int):
-        self.html_output = ""
-        for node in self.ast:
-            self.html_output += self.output(node, base_indent)
-        return self.html_output
+from mark.parser import (Node, node_names, PARAGRAPH, TEXT, HEADER, LINK, IMAGE,
+                         REFERENCE, CODEBLOCK, HORIZANTAL_RULE)
+from mark.highlighting import highlight
+import io
+import json
+
+tags = {
+    "HORIZANTAL RULE": "<hr>",
+    "PARAGRAPH": "<p>",
+    "BOLD": "<strong>",
+    "ITALIC": "<em>",
+    "MONOSPACE": "<code>",
+    "CODEBLOCK": "<code>",
+    "UNORDERED LIST": "<ul>",
+    "ORDERED LIST": "<ol>",
+    "LIST ITEM": "<li>",
+    "CODEBLOCK": "<code>",
+    "BLOCKQUOTE": "<blockquote>",
+    "HEADER": lambda level: f"<h{level}>",
+    "LINK": lambda href: f"<a href='{href}'>",
+    "IMAGE": lambda path, alt: f"<img src='{path}' alt='{alt}' title='{alt}'>"
+}
+
+# Returns a function that writes html fragments to @sink: a text stream,
+# a binary stream (written as utf-8) or a list the fragments are appended to.
+def sink_writer(sink):
+    if isinstance(sink, list):
+        return sink.append
+    if isinstance(sink, (io.RawIOBase, io.BufferedIOBase)):
+        write = sink.write
+        return lambda fragment: write(fragment.encode("utf-8"))
+    return sink.write
+
+# Opening and closing tags of the nodes that are nothing but a tag
+simple_tags = {kind: (tags[name], tags[name][0] + "/" + tags[name][1:])
+               for kind, name in enumerate(node_names) if isinstance(tags.get(name), str)}
+
+# The href a LINK is rendered with
+def url_builder(url_str: str) -> str:
+    if "https://" not in url_str or "http://" not in url_str:
+        url_str = f"https://{url_str}"
+    url_str = url_str.replace("\\", "/")
+    return url_str
+
+# Renderers turn a document into some output as walk() reaches its nodes.
+# `opens` and `closes` are their dispatch tables, they have a function for
+# every node kind, indexed by the kind:
+#   opens[kind](node, depth) writes what comes before the node's children. It
+#       returns True if it wrote all of the node, then its children are
+#       skipped and the close isn't called.
+#   closes[kind](node, depth) writes what comes after them.
+# begin() and end() are called before the first node and after the last.
+class Renderer:
+    opens = closes = ()
+
+    def begin(self) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+# Builds (opens, closes) out of {kind: (open, close)}, kinds that aren't in
+# @table get @default
+def dispatch_table(table: dict, default: tuple) -> tuple:
+    pairs = [table.get(kind, default) for kind in range(len(node_names))]
+    return tuple(open for open, _ in pairs), tuple(close for _, close in pairs)
+
+def _nothing(node: Node, depth: int) -> None:
+    pass
+
+# Indentation by depth, worked out the first time a depth is reached
+class _Prefixes(dict):
+    def __init__(self, prettify: bool, base_indent: int):
+        self.prettify = prettify
+        self.base_indent = base_indent
+
+    def __missing__(self, depth: int) -> str:
+        prefix = (" " * 4) * (self.base_indent + depth) if self.prettify else ""
+        self[depth] = prefix
+        return prefix
+
+class HtmlRenderer(Renderer):
+    # @write: where the html goes, see sink_writer
+    # @base_indent: indent of the top level nodes when prettified
+    # @highlight: highlight code blocks in the languages highlighting supports
+    def __init__(self, write, prettify: bool, base_indent: int, highlight: bool = False,
+                 url_builder=url_builder):
+        self.write = write
+        self.prettify = prettify
+        self.highlight = highlight
+        self.url_builder = url_builder
+        self.newline = "\n" if prettify else ""
+        self.prefix = _Prefixes(prettify, base_indent)
+        self.opens, self.closes = _html_handlers(self)
+
+    def codeblock(self, node: Node, depth: int) -> bool:
+        write, prefix, newline = self.write, self.prefix[depth], self.newline
+        write(prefix + "<pre>\n" + prefix + "<code>\n" + prefix)
+        code = node.children[0].value.replace("\t", "    ")
+        highlighted = None
+        if self.highlight and node.lang is not None:
+            highlighted = highlight(code, node.lang)
+        if highlighted is None:
+            code = code.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        else:
+            code = highlighted
+        # Every line of code is indented
+        if prefix:
+            code = code.replace("\n", "\n" + prefix)
+        write(code)
+        write(newline + prefix + "</code>" + newline + prefix + "</pre>" + newline)
+        return True
+
+# The handlers are closures over what they write with, rendering is mostly
+# calling them
+def _html_handlers(renderer: HtmlRenderer) -> tuple:
+    write, prefix, newline, url = renderer.write, renderer.prefix, renderer.newline, renderer.url_builder
+
+    # Not a lambda, a stream's write returns a count that would read as the
+    # node being done
+    def simple_tag(tag: str):
+        def handler(node, depth):
+            write(prefix[depth] + tag + newline)
+        return handler
+
+    if renderer.prettify:
+        def text(node, depth):
+            write(prefix[depth] + node.value + newline)
+            return True
+    else:
+        def text(node, depth):
+            write(node.value)
+            return True
+
+    def header(node, depth):
+        write(prefix[depth] + tags['HEADER'](node.level) + newline)
+
+    def close_header(node, depth):
+        write(prefix[depth] + f"</h{node.level}>" + newline)
+
+    def link(node, depth):
+        write(prefix[depth] + tags['LINK'](url(node.href)) + newline)
+
+    def reference(node, depth):
+        write(prefix[depth] + f"<a href='{node.children[0].value}'>" + newline)
+
+    def image(node, depth):
+        write(prefix[depth] + tags['IMAGE'](node.path, node.alt) + newline)
+        return True
+
+    def horizantal_rule(node, depth):
+        write(prefix[depth] + "<hr/>" + newline)
+        return True
+
+    table = {kind: (simple_tag(opening), simple_tag(closing))
+             for kind, (opening, closing) in simple_tags.items()}
+    table.update({
+        TEXT: (text, None),
+        HEADER: (header, close_header),
+        LINK: (link, simple_tag("</a>")),
+        REFERENCE: (reference, simple_tag("</a>")),
+        IMAGE: (image, None),
+        HORIZANTAL_RULE: (horizantal_rule, None),
+        CODEBLOCK: (renderer.codeblock, None),
+    })
+    return dispatch_table(table, default=None)
+
+# The text a reader sees, ex: for a search index. Text is written like the html
+# has it, with a newline after every paragraph, header and code block. Images
+# are their alt text.
+class TextRenderer(Renderer):
+    def __init__(self, write):
+        self.write = write
+        self.opens, self.closes = dispatch_table({
+            TEXT: (self.text, None),
+            IMAGE: (self.image, None),
+            CODEBLOCK: (self.codeblock, None),
+            PARAGRAPH: (_nothing, self.end_block),
+            HEADER: (_nothing, self.end_block),
+        }, default=(_nothing, _nothing))
+
+    def text(self, node: Node, depth: int) -> bool:
+        self.write(node.value)
+        return True
+
+    def image(self, node: Node, depth: int) -> bool:
+        self.write(node.alt)
+        return True
+
+    def codeblock(self, node: Node, depth: int) -> bool:
+        self.write(node.children[0].value + "\n")
+        return True
+
+    def end_block(self, node: Node, depth: int) -> None:
+        self.write("\n")
+
+_json_string = json.encoder.encode_basestring
+_json_types = ['{"type": ' + _json_string(name) for name in node_names]
+
+# The document as a JSON array of its nodes. Every node is an object with its
+# "type" (see parser.node_names), its "data" (Node.element_data) if it has any
+# and its "children" unless it's a TEXT or an IMAGE.
+class JsonRenderer(Renderer):
+    def __init__(self, write):
+        self.write = write
+        self.first = [True] # Whether the next node is the first of its siblings
+        self.opens, self.closes = dispatch_table({}, default=(self.node, self.close_node))
+
+    def begin(self) -> None:
+        self.first = [True]
+        self.write("[")
+
+    def end(self) -> None:
+        self.write("]")
+
+    def node(self, node: Node, depth: int) -> bool:
+        kind = node.kind
+        leaf = kind == TEXT or kind == IMAGE
+        if kind == TEXT: # Most nodes are, they're written without a dict
+            fragment = '{"type": "TEXT", "data": {"value": ' + _json_string(node.value) + '}'
+        else:
+            fragment = _json_types[kind]
+            data = node.element_data
+            if data:
+                fragment += ', "data": ' + json.dumps(data)
+            if not leaf:
+                fragment += ', "children": ['
+
+        if self.first[-1]:
+            self.first[-1] = False
+        else:
+            fragment = ", " + fragment
+        if leaf:
+            self.write(fragment + "}")
+            return True
+        self.write(fragment)
+        self.first.append(True)
+
+    def close_node(self, node: Node, depth: int) -> None:
+        self.first.pop()
+        self.write("]}")
+
+# Feeds @document to every one of @renderers in a single pass. The nodes that
+# are still open are kept on a stack instead of recursing into them, along with
+# the renderers that went into them.
+def walk(document: list, renderers: list) -> None:
+    for renderer in renderers:
+        renderer.begin()
+    if len(renderers) == 1:
+        _walk(document, renderers[0])
+    else:
+        _walk_many(document, renderers)
+    for renderer in renderers:
+        renderer.end()
+
+def _walk(document: list, renderer: Renderer) -> None:
+    opens, closes = renderer.opens, renderer.closes
+    # (children left to walk, their depth, the node they're the children of)
+    stack = [(iter(document), 0, None)]
+    while stack:
+        children, depth, parent = stack[-1]
+        for node in children:
+            if opens[node.kind](node, depth):
+                continue
+            if node.children:
+                stack.append((iter(node.children), depth + 1, node))
+                break
+            closes[node.kind](node, depth)
+        else:
+            stack.pop()
+            if parent is not None:
+                closes[parent.kind](parent, depth - 1)
+
+def _walk_many(document: list, renderers: list) -> None:
+    # Like _walk, with the (opens, closes) of the renderers that went into the
+    # children as well
+    stack = [(iter(document), 0, None, [(r.opens, r.closes) for r in renderers])]
+    while stack:
+        children, depth, parent, inside = stack[-1]
+        for node in children:
+            kind = node.kind
+            if not node.children:
+                for opens, closes in inside:
+                    if not opens[kind](node, depth):
+                        closes[kind](node, depth)
+                continue
+
+            going_in = [tables for tables in inside if not tables[0][kind](node, depth)]
+            if going_in:
+                stack.append((iter(node.children), depth + 1, node, going_in))
+                break
+        else:
+            stack.pop()
+            if parent is not None:
+                for _, closes in inside:
+                    closes[parent.kind](parent, depth - 1)
+
+class OutputGenerator:
+    # @highlight: highlight code blocks in the languages highlighting supports
+    def __init__(self, ast: list, should_prettify_html: bool, highlight: bool = False):
+        self.ast = ast
+        self.html_output = ""
+        self.prettify = should_prettify_html
+        self.highlight = highlight
+
+    def url_builder(self, url_str: str) -> str:
+        return url_builder(url_str)
+
+    def output(self, node: Node, indent: int) -> str:
+        out = []
+        self.write(node, indent, out.append)
+        return ''.join(out)
+
+    # Writes the html of `node` as a series of fragments, nothing is built up
+    # and handed back to the parent node
+    def write(self, node: Node, indent: int, write) -> None:
+        _walk((node,), self.renderer(write, indent))
+
+    # The HtmlRenderer this generator renders with, to walk() it along with others
+    def renderer(self, write, base_indent: int) -> HtmlRenderer:
+        return HtmlRenderer(write, self.prettify, base_indent, self.highlight, self.url_builder)
+
+    # @base_indent: int -> Perhaps useful if embedding in existing html that's
+    #                      already tabbed.
+    def compile(self, base_indent: int):
+        out = []
+        self.render(out, base_indent)
+        self.html_output = ''.join(out)
+        return self.html_output
+
+    # Writes the html straight to @sink instead of returning it. See sink_writer.
+    def render(self, sink, base_indent: int) -> None:
+        _walk(self.ast, self.renderer(sink_writer(sink), base_indent))
@@ -0,0 +1,53 @@
+from mark.markdown import Compiler
+from mark.incremental import cut_blocks, needs_whole_compile
+from mark.errors import MarkError
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+# Cuts @source into about @count shards of whole top level blocks and returns
+# their (start, end) spans, see incremental.cut_blocks. Anything that runs on
+# past the end of a shard is caught by compile_parallel.
+def shard_spans(source: str, count: int) -> list:
+    return cut_blocks(source, len(source) / count)
+
+# Runs in a worker, returns None if the shard doesn't compile on its own
+def _compile_shard(task: tuple):
+    text, prettify, base_indent = task
+    try:
+        return Compiler(text, False, False, prettify).compile(base_indent)
+    except MarkError:
+        return None
+
+# Compiles @source into the same html as Compiler(source, ...).compile(base_indent)
+# does, but in @shards pieces (see shard_spans) on @jobs processes. Both default
+# to the number of cpus.
+def compile_parallel(source: str, prettify: bool, base_indent: int, jobs=None, shards=None) -> str:
+    jobs = jobs or os.cpu_count() or 1
+    spans = shard_spans(source, shards or jobs)
+    if len(spans) < 2 or needs_whole_compile(source):
+        return Compiler(source, False, False, prettify).compile(base_indent)
+
+    tasks = [(source[start:end], prettify, base_indent) for start, end in spans]
+    with ProcessPoolExecutor(min(jobs, len(tasks))) as pool:
+        results = list(pool.map(_compile_shard, tasks))
+
+    # A shard fails on its own if a block in it runs into the next shard (an
+    # unclosed code block or emphasis), so it's compiled together with the
+    # shards after it until they compile. See incremental.Document.update.
+    html = []
+    last = len(spans) - 1
+    i = 0
+    while i <= last:
+        j = i
+        result = results[i]
+        while result is None:
+            if j == last:
+                # Nothing left to run into, what's left can depend on the blocks
+                # before it (ex: it ends in an escaped newline). The serial compile
+                # has the html, or raises what it would.
+                return Compiler(source, False, False, prettify).compile(base_indent)
+            j += 1
+            result = _compile_shard((source[spans[i][0]:spans[j][1]], prettify, base_indent))
+        html.append(result)
+        i = j + 1
+    return ''.join(html)
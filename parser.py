@@ -1,399 +1,637 @@
-from mark.lexer import Token
-
-class Node:
-    def __init__(self, node_type: str):
-        self.type = node_type
-        self.element_data = {}
-        self.children = []
-
-def debug_node(node, nest_level):
-    indent = "   " * nest_level if nest_level > 0 else ""
-    data = f"| {node.element_data}" if node.element_data != {} else ""
-    print(indent, node.type, data)
-    for n in node.children:
-        debug_node(n, nest_level + 1)
-
-class Parser:
-    def __init__(self, tokens: list, should_debug: bool):
-        self.tokens = tokens
-        self.index = -1
-        self.document = self._parse()
-
-        self.should_debug = should_debug
-        self.debug()
-    
-    def debug(self):
-        if self.should_debug:
-            for node in self.document:
-                debug_node(node, 0)
-                print()
-
-    def _read(self, amount=1) -> list:
-        tokens = []
-        stop = self.index + amount
-        while self.index < stop:
-            self.index += 1
-        
-            if not self.index < len(self.tokens):
-                break
-
-            tokens.append(self.tokens[self.index])
-        return tokens
-
-    def _peek(self, amount=1) -> list:
-        tokens = []
-        temp_index = self.index
-        stop = self.index + amount
-        while temp_index < stop:
-            temp_index += 1
-
-            if not temp_index < len(self.tokens):
-                break
-
-            tokens.append(self.tokens[temp_index])
-        return tokens
-    
-    def _parse_text(self) -> Node:
-        node = Node("TEXT")
-        node.element_data = {"value": self.tokens[self.index].raw}
-        return node
-
-    def _parse_horizantal_rule(self) -> Node:
-        node = Node("HORIZANTAL RULE")
-
-        while self.tokens[self.index].type == "HYPHEN":
-            self.index += 1
-
-        return node
-
-    def _parse_link(self) -> Node:
-        self.index += 1 # Skip the open bracket
-        node = Node("LINK")
-        child_nodes = self._parse_inline("CLOSED PARENTHESES")
-
-        node.children = child_nodes[: len(child_nodes) - 1]
-        node.element_data['href'] = child_nodes[-1].element_data['value']
-
-        return node
-
-    # Images are not nestable -> ![ALT](path) both the ALT and path must be TEXT nodes
-    def _parse_img(self) -> Node:
-        node = Node("IMAGE")
-        self.index += 2 # Skip the exclamation point and the open bracket
-        child_nodes = self._parse_inline("CLOSED PARENTHESES")
-
-        node.element_data['alt'] = child_nodes[0].element_data['value']
-        node.element_data['path'] = child_nodes[1].element_data['value']
-
-        return node
-
-    # References must contain text and nothing else
-    def _parse_reference(self) -> Node:
-        node = Node("REFERENCE")
-
-        self.index += 1 # Skipping the opening <
-        node.children.append(self._parse_text())
-        self.index += 1 # Skipping the closing >
-
-        return node
-
-    def _parse_monospace(self) -> Node:
-        node = Node("MONOSPACE")
-        self.index += 1 # Skipping the `
-        node.children = self._parse_inline("BACKTICK")
-        return node
-
-    def _parse_italic(self) -> Node:
-        end_literal = self.tokens[self.index].type
-        node = Node("ITALIC")
-        self.index += 1 # Skip the closing *
-        node.children = self._parse_inline(end_literal)
-        return node
-
-    def _parse_bold(self) -> Node:
-        end_literal = self.tokens[self.index].type
-        node = Node("BOLD")
-        self.index += 2 # Skip the current * and the next *
-
-        # nested text styling
-        t = self.tokens[self.index].type
-        if t == "ASTRIX":
-            node.children.append(self._parse_italic())
-
-            t = self.tokens[self.index + 1].type
-            if t != "ASTRIX":
-                self.index += 1 # Skip the current token
-                for i in self._parse_inline(end_literal):
-                    node.children.append(i)
-                self.index += 1 # Skip the ending *
-                return node
-
-            self.index += 2 # Skip the two trailing *
-            return node
-
-        node.children = self._parse_inline(end_literal)
-        self.index += 1 # Skip the trailing *
-
-        return node
-
-    def _parse_codeblock(self) -> Node:
-        node = Node("CODEBLOCK")
-    
-        # Potentially getting the codeblock language, ex: ```py\n THE CODE \n```
-        self.index += 3
-        lang = self._parse_inline("NEWLINE")
-        lang = None if len(lang) == 0 else lang[0].element_data['value']
-        node.element_data = {"type": lang}
-
-        code = [] # Tokens have no special meaning inside code blocks
-        while self.tokens[self.index].type != "BACKTICK":
-            code.append(self._read()[0].raw)
-        code = ''.join(code[:len(code) - 2]) # Removing the trailing backtick and newline
-
-        code_node = Node("TEXT")
-        code_node.element_data = {"value": code}
-        node.children.append(code_node)
-
-        self.index += 2 # Skipping the 2 ``
-        return node
-
-    def _parse_header(self) -> Node:
-        node = Node("HEADER")
-        header_type = 0
-        t = self.tokens[self.index]
-        
-        # Get header level, h1, h2, etc...
-        while t.type == "HASH":
-            header_type += 1
-            t = self._read()[0]
-        header_type = 1 if header_type == 0 else header_type
-        
-        node.element_data = {"level": header_type}
-        node.children = self._parse_inline("NEWLINE")
-
-        return node
-
-    def _parse_paragraph(self):
-        node = Node("PARAGRAPH")
-
-        stops = ["HASH", "PLUS", "BACKTICK", "TAB", "HYPHEN",
-                 "CLOSED ANGLER BRACKET"]
-        while True:
-            for i in self._parse_inline("NEWLINE"):
-                node.children.append(i)
-
-            if self.index + 1 >= len(self.tokens):
-                next_token = Token("NEWLINE", "\n")
-            else:
-                next_token = self.tokens[self.index + 1]
-
-            # A new line break
-            if self.tokens[self.index].type == next_token.type:
-                break
-            elif next_token.type in stops:
-                break
-            
-            if self.tokens[self.index - 1].type == "CARRIAGE RETURN":
-                break
-
-            self.index += 1
-
-        return node
-
-    def _parse_list_item(self, indent: int) -> Node:
-        if self.tokens[self.index].type != "\t" :
-            t = self.tokens[self.index]
-        else:
-            t = self.tokens[self.index + 1]
-        list_item_type = "ORDERED LIST" if t.raw == '+' else "UNORDERED LIST"
-
-        list_item = Node("LIST ITEM")
-        list_item.element_data = {"indent": indent}
-        list_item.element_data['type'] = list_item_type
-
-        t = self.tokens[self.index]
-        if t.raw == ' ' or t.raw == '-':
-            self.index += 1
-            t = self.tokens[self.index]
-
-        if t.type == "HASH":
-            list_item.children.append(self._parse_header())
-
-        elif self._peek()[0].type == "CLOSED ANGLER BRACKET":
-            self.index += 1
-            list_item.children.append(self._parse_blockquote())
-
-        elif t.type != "NEWLINE":
-            list_item.children.append(self._parse_paragraph())
-
-        return list_item
-
-    def _parse_list_items(self) -> list:
-        indent = 0
-        list_items = []
-        while len(self._peek()) > 0 and self._peek()[0].type != "NEWLINE":
-            t = self.tokens[self.index]
-            if t.type == "NEWLINE" or t.type == "HYPHEN":
-                self.index += 1
-
-            t = self.tokens[self.index]
-            if t.type == "TAB":
-                i = 0
-                while self.tokens[self.index].type == "TAB":
-                    self.index += 1
-                    i += 1
-                indent = i
-            
-            # 'Reset'
-            ending_token_types = ["HYPHEN", "PLUS"]
-            if t.type in ending_token_types and self.tokens[self.index - 1].type == "NEWLINE":
-                indent = 0
-                self.index += 1
-
-            list_items.append(self._parse_list_item(indent))
-
-        return list_items
-
-    # Parsing all the list items first, then assembling them into a tree with a bottom up approach	
-    def _assemble_list(self, list_type: str) -> Node:
-        node = Node(list_type)
-
-        # List (tree building)
-        list_items = self._parse_list_items()
-        i = len(list_items) - 1
-        has_seen = []
-        while i > 0:
-            indent = list_items[i].element_data['indent']
-            same_indent = []
-            start = i
-            while list_items[i].element_data['indent'] == indent:
-                same_indent.append(list_items[i])
-                i -= 1
-                if i == 0: break
-            i = 0 if i < 0 else i
-            same_indent = same_indent[::-1] # Since it was read back to front
-
-            if indent > list_items[i].element_data['indent']:
-                head = same_indent[0].element_data['type']
-                list_type = "UNORDERED LIST" if head == "UNORDERED LIST" else "ORDERED LIST"
-
-                child = Node(list_type)
-                for c in same_indent:
-                    c.element_data = {}
-                    child.children.append(c)
-
-                list_items[i].children.append(child)
-
-                list_items = [l for x, l in enumerate(list_items) if x not in range(i + 1, start + 1)]
-                i = len(list_items) - 1
-
-        for c in list_items:
-            c.element_data = {}
-            node.children.append(c)
-        return node
-
-    def _parse_blockquote(self) -> Node:
-        node = Node("BLOCKQUOTE")
-
-        while len(self._peek()) > 0 and self._peek()[0].type != "NEWLINE":
-            # Skipping unnessary whitespcae
-            if self.tokens[self.index + 1].raw == " ":
-                self.index += 1
-
-            block = self._parse_block()
-            node.children.append(block)
-
-            # Continuing blockquotes
-            if self.tokens[self.index].type == "NEWLINE":
-                if len(self._peek()) > 0 and self._peek()[0].raw == ">":
-                    self.index += 1
-                if len(self._peek()) > 0 and self._peek()[0].type == "TAB":
-                    temp_index = self.index
-                    while self._peek()[0].type == "TAB":
-                        self.index += 1
-                        
-                    if self._peek()[0].type == "PLUS" or self._peek()[0].type == "HYPHEN":
-                        self.index = temp_index
-                        break
-
-        return node
-
-    # Inline nodes are nodes that can't self nest: BOLD, ITALIC, LINK, IMAGE, TEXT
-    def _parse_inline(self, end_delim: str) -> list:
-        inline_nodes = []
-        token = self.tokens[self.index].type
-
-        while token != end_delim:
-            if token == "OPEN BACKET":
-                inline_nodes.append(self._parse_link())
-
-            elif token == "ASTRIX":
-                if self._peek()[0].type == "ASTRIX":
-                    inline_nodes.append(self._parse_bold())
-                else:
-                    inline_nodes.append(self._parse_italic())
-
-            elif token == "EXCLAMATION" and self._peek()[0].type == "OPEN BACKET":
-                inline_nodes.append(self._parse_img())
-
-            elif token == "BACKTICK" and self._peek()[0].type == "TEXT":
-                inline_nodes.append(self._parse_monospace())
-            
-            elif token == "OPEN ANGLER BRACKET":
-                inline_nodes.append(self._parse_reference())
-
-            elif token == "TEXT":
-                inline_nodes.append(self._parse_text())
-
-            token = self._read()[0].type
-
-        return inline_nodes
-    
-    # Blocks are the 'parent' elements and can contain the inline elements and themeselves
-    # PARAGRAPHS, HEADERS, CODEBLOCKS, LISTS (ORDERED and UNORDERED), HORIZANTAL RULES, BLOCKQUOTES
-    def _parse_block(self) -> Node:
-        current_token = self._read()
-        previous_token = self.tokens[self.index - 1]
-
-        if len(current_token) == 0:
-            return "EOF"
-        else:
-            current_token = current_token[0]
-
-        if current_token.type == "HASH":
-            return self._parse_header()
-
-        elif current_token.type == "BACKTICK" and self._peek()[0].type == "BACKTICK":
-            return self._parse_codeblock()
-
-        elif current_token.type == "HYPHEN" and self._peek()[0].type == "HYPHEN":
-            return self._parse_horizantal_rule()
-
-        elif current_token.type == "HYPHEN":
-            return self._assemble_list("UNORDERED LIST")
-
-        elif current_token.type == "PLUS":
-            return self._assemble_list("ORDERED LIST")
-
-        elif current_token.type == "CLOSED ANGLER BRACKET" and \
-            (previous_token.type == "NEWLINE" or previous_token.raw == ' '):
-            return self._parse_blockquote()
-
-        else:
-            if current_token.type != "NEWLINE":
-                return self._parse_paragraph()
-            else:
-                return "NEWLINE"
-
-    def _parse(self):
-        document = []
-        while self.index < len(self.tokens):
-            block = self._parse_block()
-
-            if block == "NEWLINE":
-                continue
-            elif block == "EOF":
-                break
-
-            document.append(block)
-        return document
+from mark.lexer import (Token, keywords, HASH, HYPHEN, PLUS, ASTRIX, BACKTICK,
+                        EXCLAMATION, OPEN_BRACKET, CLOSED_PARENTHESES,
+                        OPEN_ANGLER_BRACKET, CLOSED_ANGLER_BRACKET,
+                        CARRIAGE_RETURN, NEWLINE, TAB, TEXT as TEXT_TOKEN,
+                        CODE as CODE_TOKEN, expand_code)
+from mark.errors import ParseError, NestingTooDeep
+from mark.limits import no_limits, check_deadline
+from types import GeneratorType
+import sys
+
+# Node types are small ints, node_names maps them back to their names
+(PARAGRAPH, HEADER, CODEBLOCK, UNORDERED_LIST, ORDERED_LIST, LIST_ITEM,
+ HORIZANTAL_RULE, BLOCKQUOTE, BOLD, ITALIC, MONOSPACE, LINK, IMAGE,
+ REFERENCE, TEXT) = range(15)
+node_names = ["PARAGRAPH", "HEADER", "CODEBLOCK", "UNORDERED LIST", "ORDERED LIST",
+              "LIST ITEM", "HORIZANTAL RULE", "BLOCKQUOTE", "BOLD", "ITALIC",
+              "MONOSPACE", "LINK", "IMAGE", "REFERENCE", "TEXT"]
+
+# Nodes only carry the fields their type needs. `type` and `element_data`
+# give the same view of the tree as before the fields were typed.
+class Node:
+    __slots__ = ("kind", "children")
+
+    def __init__(self, kind: int):
+        self.kind = kind
+        self.children = []
+
+    @property
+    def type(self) -> str:
+        return node_names[self.kind]
+
+    @property
+    def element_data(self) -> dict:
+        return {}
+
+class Text(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        self.kind = TEXT
+        self.children = () # Text never has children, they all share one tuple
+        self.value = value
+
+    @property
+    def element_data(self) -> dict:
+        return {"value": self.value}
+
+class Header(Node):
+    __slots__ = ("level",)
+
+    def __init__(self, level: int):
+        self.kind = HEADER
+        self.children = []
+        self.level = level
+
+    @property
+    def element_data(self) -> dict:
+        return {"level": self.level}
+
+class Link(Node):
+    __slots__ = ("href",)
+
+    def __init__(self):
+        self.kind = LINK
+        self.children = []
+        self.href = None
+
+    @property
+    def element_data(self) -> dict:
+        return {"href": self.href}
+
+class Image(Node):
+    __slots__ = ("alt", "path")
+
+    def __init__(self, alt: str, path: str):
+        self.kind = IMAGE
+        self.children = ()
+        self.alt = alt
+        self.path = path
+
+    @property
+    def element_data(self) -> dict:
+        return {"alt": self.alt, "path": self.path}
+
+# The code itself is kept in a TEXT child
+class CodeBlock(Node):
+    __slots__ = ("lang",)
+
+    def __init__(self, lang):
+        self.kind = CODEBLOCK
+        self.children = []
+        self.lang = lang
+
+    @property
+    def element_data(self) -> dict:
+        return {"type": self.lang}
+
+# The indent and list type are only needed while the list is being assembled
+class ListItem(Node):
+    __slots__ = ("indent", "list_kind")
+
+    def __init__(self, indent: int, list_kind: int):
+        self.kind = LIST_ITEM
+        self.children = []
+        self.indent = indent
+        self.list_kind = list_kind
+
+def debug_node(node, nest_level):
+    stack = [(node, nest_level)]
+    while stack:
+        node, nest_level = stack.pop()
+        indent = "   " * nest_level if nest_level > 0 else ""
+        data = f"| {node.element_data}" if node.element_data != {} else ""
+        print(indent, node.type, data)
+        stack.extend((n, nest_level + 1) for n in reversed(node.children))
+
+# What _parse_inline calls an italic run that opened a bold one, ex: ***a* b**
+_ITALIC_IN_BOLD = -1
+
+# Start of document stand in for the token before the first one
+_newline = keywords["\n"]
+
+# Buffers a lazily produced token sequence for the parser. Tokens are pulled
+# in as they're indexed and dropped once the parser releases them.
+class TokenStream:
+    def __init__(self, tokens):
+        self.source = iter(tokens)
+        self.buffer = []
+        self.offset = 0 # The absolute index of buffer[0]
+
+    # Returns False if the stream ends before `index`
+    def fill(self, index: int) -> bool:
+        while index >= self.offset + len(self.buffer):
+            token = next(self.source, None)
+            if token is None:
+                return False
+            self.buffer.append(token)
+        return True
+
+    def __getitem__(self, index: int) -> Token:
+        if index < self.offset:
+            if index < 0:
+                return _newline
+            raise IndexError("token has already been released")
+        if not self.fill(index):
+            raise IndexError("token index out of range")
+        return self.buffer[index - self.offset]
+
+    # Forgets every token before `index`
+    def release(self, index: int) -> None:
+        count = min(index - self.offset, len(self.buffer))
+        if count > 0:
+            del self.buffer[:count]
+            self.offset += count
+
+# The parser's position in the tokens. Nothing is copied out of them to look
+# around, reading past the end raises IndexError and at_end() says whether
+# there's anything left to read.
+class Cursor:
+    __slots__ = ("tokens", "index")
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = -1 # Nothing has been read yet
+
+    def in_bounds(self, index: int) -> bool:
+        return index < len(self.tokens)
+
+    def at_end(self) -> bool:
+        return self.index + 1 >= len(self.tokens)
+
+    def current(self) -> Token:
+        return self.tokens[self.index]
+
+    # The token @offset tokens away from the current one, without moving
+    def peek(self, offset=1) -> Token:
+        return self.tokens[self.index + offset]
+
+    # Moves to the next token and returns it
+    def advance(self) -> Token:
+        self.index += 1
+        return self.tokens[self.index]
+
+    # Moves without reading, so it's fine to go past the end
+    def skip(self, amount=1) -> None:
+        self.index += amount
+
+# A cursor over a TokenStream, which only knows its length once it's drained
+class StreamCursor(Cursor):
+    __slots__ = ()
+
+    def in_bounds(self, index: int) -> bool:
+        return self.tokens.fill(index)
+
+    def at_end(self) -> bool:
+        return not self.tokens.fill(self.index + 1)
+
+# @limits: a limits.Limits, the time it has runs out at @deadline if given
+class Parser:
+    def __init__(self, tokens: list, should_debug: bool, limits=no_limits, deadline=None):
+        self.tokens = tokens
+        self.cursor = Cursor(tokens)
+        self._limit(limits, deadline)
+        self.document = self._parse()
+
+        self.should_debug = should_debug
+        self.debug()
+    
+    def debug(self):
+        if self.should_debug:
+            for node in self.document:
+                debug_node(node, 0)
+                print()
+
+    def _limit(self, limits, deadline) -> None:
+        self.max_depth = sys.maxsize if limits.max_depth is None else limits.max_depth
+        self.deadline = limits.deadline() if deadline is None else deadline
+        self.depth = 0 # Of the blocks being parsed
+
+    # Called by the blocks that contain other blocks, until they _leave
+    def _enter(self) -> None:
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self._too_deep()
+        check_deadline(self.deadline)
+
+    def _leave(self) -> None:
+        self.depth -= 1
+
+    def _too_deep(self):
+        raise NestingTooDeep(f"Markdown is nested more than {self.max_depth} deep.")
+
+    # The parse methods of blocks that contain other blocks (lists and
+    # blockquotes) are generators, so that nesting doesn't use up the call
+    # stack. They yield the generator of every block they need parsed and are
+    # sent back what it returned, anything else they yield is sent right back.
+    def _run(self, routine):
+        if routine.__class__ is not GeneratorType:
+            return routine
+
+        stack = []
+        value = None
+        while True:
+            try:
+                child = routine.send(value)
+            except StopIteration as done:
+                if not stack:
+                    return done.value
+                routine = stack.pop()
+                value = done.value
+                continue
+
+            if child.__class__ is GeneratorType:
+                stack.append(routine)
+                routine = child
+                value = None
+            else:
+                value = child
+
+    def _parse_text(self) -> Node:
+        return Text(self.cursor.current().raw)
+
+    def _parse_horizantal_rule(self) -> Node:
+        node = Node(HORIZANTAL_RULE)
+
+        cursor = self.cursor
+        while cursor.current().kind == HYPHEN:
+            cursor.skip()
+
+        return node
+
+    # References must contain text and nothing else
+    def _parse_reference(self) -> Node:
+        node = Node(REFERENCE)
+
+        self.cursor.skip() # Skipping the opening <
+        node.children.append(self._parse_text())
+        self.cursor.skip() # Skipping the closing >
+
+        return node
+
+    def _parse_codeblock(self) -> Node:
+        cursor = self.cursor
+        # Potentially getting the codeblock language, ex: ```py\n THE CODE \n```
+        cursor.skip(3)
+        lang = self._parse_inline(NEWLINE)
+        lang = None if len(lang) == 0 else lang[0].value
+        node = CodeBlock(lang)
+
+        if cursor.peek().kind == CODE_TOKEN: # The lexer already has the code in one piece
+            node.children.append(Text(cursor.peek().code))
+            cursor.skip(2) # To the first `
+        else:
+            code = [] # Tokens have no special meaning inside code blocks
+            while cursor.current().kind != BACKTICK:
+                code.append(cursor.advance().raw)
+            code = ''.join(code[:len(code) - 2]) # Removing the trailing backtick and newline
+            node.children.append(Text(code))
+
+        cursor.skip(2) # Skipping the 2 ``
+        return node
+
+    def _parse_header(self) -> Node:
+        header_type = 0
+        t = self.cursor.current()
+        
+        # Get header level, h1, h2, etc...
+        while t.kind == HASH:
+            header_type += 1
+            t = self.cursor.advance()
+        header_type = 1 if header_type == 0 else header_type
+        
+        node = Header(header_type)
+        node.children = self._parse_inline(NEWLINE)
+
+        return node
+
+    def _parse_paragraph(self):
+        node = Node(PARAGRAPH)
+        cursor = self.cursor
+
+        stops = (HASH, PLUS, BACKTICK, TAB, HYPHEN, CLOSED_ANGLER_BRACKET)
+        while True:
+            for i in self._parse_inline(NEWLINE):
+                node.children.append(i)
+
+            next_token = _newline if cursor.at_end() else cursor.peek()
+
+            # A new line break
+            if cursor.current().kind == next_token.kind:
+                break
+            elif next_token.kind in stops:
+                break
+            
+            if cursor.peek(-1).kind == CARRIAGE_RETURN:
+                break
+
+            cursor.skip()
+
+        return node
+
+    def _parse_list_item(self, indent: int) -> Node:
+        cursor = self.cursor
+        t = cursor.current()
+        list_item_type = ORDERED_LIST if t.raw == '+' else UNORDERED_LIST
+        list_item = ListItem(indent, list_item_type)
+
+        if t.raw == ' ' or t.raw == '-':
+            t = cursor.advance()
+
+        if t.kind == HASH:
+            list_item.children.append(self._parse_header())
+
+        elif cursor.peek().kind == CLOSED_ANGLER_BRACKET:
+            cursor.skip()
+            list_item.children.append((yield self._parse_blockquote()))
+
+        elif t.kind != NEWLINE:
+            list_item.children.append(self._parse_paragraph())
+
+        return list_item
+
+    def _parse_list_items(self) -> list:
+        cursor = self.cursor
+        indent = 0
+        list_items = []
+        while not cursor.at_end() and cursor.peek().kind != NEWLINE:
+            t = cursor.current()
+            if t.kind == NEWLINE or t.kind == HYPHEN:
+                t = cursor.advance()
+
+            if t.kind == TAB:
+                i = 0
+                while cursor.current().kind == TAB:
+                    cursor.skip()
+                    i += 1
+                indent = i
+                if self.depth + indent > self.max_depth:
+                    self._too_deep()
+            
+            # 'Reset'
+            if (t.kind == HYPHEN or t.kind == PLUS) and cursor.peek(-1).kind == NEWLINE:
+                indent = 0
+                cursor.skip()
+
+            list_items.append((yield self._parse_list_item(indent)))
+            check_deadline(self.deadline)
+
+        return list_items
+
+    # Parsing all the list items first, then assembling them into a tree in one
+    # pass. An item is nested under the closest item before it that's indented
+    # less, and consecutive items with the same indent share a list.
+    def _assemble_list(self, list_type: int) -> Node:
+        self._enter()
+        node = Node(list_type)
+
+        # [item, its current sub list, indent of that list's items] for every
+        # item that later items could still be nested under
+        stack = []
+        for item in (yield self._parse_list_items()):
+            indent = item.indent
+            while stack and stack[-1][0].indent >= indent:
+                stack.pop()
+
+            if not stack:
+                node.children.append(item)
+            else:
+                parent = stack[-1]
+                if parent[1] is None or parent[2] != indent:
+                    kind = UNORDERED_LIST if item.list_kind == UNORDERED_LIST else ORDERED_LIST
+                    parent[1] = Node(kind)
+                    parent[2] = indent
+                    parent[0].children.append(parent[1])
+                parent[1].children.append(item)
+
+            stack.append([item, None, None])
+
+        self._leave()
+        return node
+
+    def _parse_blockquote(self) -> Node:
+        self._enter()
+        cursor = self.cursor
+        node = Node(BLOCKQUOTE)
+
+        while not cursor.at_end() and cursor.peek().kind != NEWLINE:
+            # Skipping unnessary whitespcae
+            if cursor.peek().raw == " ":
+                cursor.skip()
+
+            block = yield self._parse_block()
+            if block is not None:
+                node.children.append(block)
+
+            # Continuing blockquotes
+            if cursor.current().kind == NEWLINE:
+                if not cursor.at_end() and cursor.peek().raw == ">":
+                    cursor.skip()
+                if not cursor.at_end() and cursor.peek().kind == TAB:
+                    start = cursor.index
+                    while cursor.peek().kind == TAB:
+                        cursor.skip()
+                        
+                    if cursor.peek().kind == PLUS or cursor.peek().kind == HYPHEN:
+                        cursor.index = start
+                        break
+
+        self._leave()
+        return node
+
+    # Inline nodes are nodes that can't self nest: BOLD, ITALIC, LINK, IMAGE, TEXT
+    # Their contents can hold other inline nodes though, so every run of inline
+    # nodes that's still open (ex: a link in italics in a link) is kept on a
+    # stack instead of recursing into it.
+    def _parse_inline(self, end_delim: int) -> list:
+        cursor = self.cursor
+        tokens = cursor.tokens
+        inline_nodes = []
+        kind = None # What the current run becomes once it ends, None at the top
+        runs = [] # (end_delim, inline_nodes, kind) of the runs around this one
+
+        while True:
+            token = tokens[cursor.index].kind
+            while token != end_delim:
+                if token == TEXT_TOKEN:
+                    inline_nodes.append(Text(tokens[cursor.index].raw))
+
+                elif token == OPEN_BRACKET:
+                    cursor.index += 1 # Skip the open bracket
+                    runs.append((end_delim, inline_nodes, kind))
+                    if len(runs) > self.max_depth - self.depth:
+                        self._too_deep()
+                    end_delim, inline_nodes, kind = CLOSED_PARENTHESES, [], LINK
+                    token = tokens[cursor.index].kind
+                    continue
+
+                elif token == ASTRIX:
+                    runs.append((end_delim, inline_nodes, kind))
+                    if len(runs) > self.max_depth - self.depth:
+                        self._too_deep()
+                    end_delim, inline_nodes = ASTRIX, []
+                    if tokens[cursor.index + 1].kind == ASTRIX:
+                        cursor.index += 2 # Skip the current * and the next *
+                        kind = BOLD
+                        # nested text styling
+                        if tokens[cursor.index].kind == ASTRIX:
+                            cursor.index += 1
+                            kind = _ITALIC_IN_BOLD
+                    else:
+                        cursor.index += 1 # Skip the opening *
+                        kind = ITALIC
+                    token = tokens[cursor.index].kind
+                    continue
+
+                elif token == EXCLAMATION and tokens[cursor.index + 1].kind == OPEN_BRACKET:
+                    cursor.index += 2 # Skip the exclamation point and the open bracket
+                    runs.append((end_delim, inline_nodes, kind))
+                    if len(runs) > self.max_depth - self.depth:
+                        self._too_deep()
+                    end_delim, inline_nodes, kind = CLOSED_PARENTHESES, [], IMAGE
+                    token = tokens[cursor.index].kind
+                    continue
+
+                elif token == BACKTICK and tokens[cursor.index + 1].kind == TEXT_TOKEN:
+                    cursor.index += 1 # Skipping the `
+                    runs.append((end_delim, inline_nodes, kind))
+                    if len(runs) > self.max_depth - self.depth:
+                        self._too_deep()
+                    end_delim, inline_nodes, kind = BACKTICK, [], MONOSPACE
+                    token = tokens[cursor.index].kind
+                    continue
+
+                elif token == OPEN_ANGLER_BRACKET:
+                    inline_nodes.append(self._parse_reference())
+
+                elif token == CODE_TOKEN:
+                    raise _CodeRead()
+
+                cursor.index += 1
+                token = tokens[cursor.index].kind
+
+            if kind is None:
+                return inline_nodes
+
+            if kind == _ITALIC_IN_BOLD:
+                node = Node(ITALIC)
+                node.children = inline_nodes
+                kind = BOLD
+                inline_nodes = [node]
+                if tokens[cursor.index + 1].kind != ASTRIX:
+                    cursor.index += 1 # Skip the current token, the rest is still bold
+                    continue
+                cursor.index += 1 # Skip the first of the two trailing *
+
+            if kind == BOLD:
+                cursor.index += 1 # Skip the trailing *
+                node = Node(BOLD)
+                node.children = inline_nodes
+
+            elif kind == LINK:
+                node = Link()
+                node.children = inline_nodes[: len(inline_nodes) - 1]
+                node.href = inline_nodes[-1].value
+
+            # Images are not nestable -> ![ALT](path) both the ALT and path must be TEXT nodes
+            elif kind == IMAGE:
+                node = Image(inline_nodes[0].value, inline_nodes[1].value)
+
+            else:
+                node = Node(kind)
+                node.children = inline_nodes
+
+            end_delim, inline_nodes, kind = runs.pop()
+            inline_nodes.append(node)
+            cursor.index += 1
+
+    # Blocks are the 'parent' elements and can contain the inline elements and themeselves
+    # PARAGRAPHS, HEADERS, CODEBLOCKS, LISTS (ORDERED and UNORDERED), HORIZANTAL RULES, BLOCKQUOTES
+    # Lists and blockquotes are handed back as the generator that parses them,
+    # see _run. Returns None if there's no block, at a blank line or the end.
+    def _parse_block(self):
+        cursor = self.cursor
+        cursor.skip()
+        previous_token = cursor.peek(-1)
+        if not cursor.in_bounds(cursor.index):
+            return None
+
+        kind = cursor.current().kind
+        if kind == HASH:
+            return self._parse_header()
+
+        elif kind == BACKTICK and cursor.peek().kind == BACKTICK:
+            return self._parse_codeblock()
+
+        elif kind == HYPHEN and cursor.peek().kind == HYPHEN:
+            return self._parse_horizantal_rule()
+
+        elif kind == HYPHEN:
+            return self._assemble_list(UNORDERED_LIST)
+
+        elif kind == PLUS:
+            return self._assemble_list(ORDERED_LIST)
+
+        elif kind == CLOSED_ANGLER_BRACKET and \
+            (previous_token.kind == NEWLINE or previous_token.raw == ' '):
+            return self._parse_blockquote()
+
+        elif kind != NEWLINE:
+            return self._parse_paragraph()
+
+        return None
+
+    # Malformed markup runs off the end of the tokens (an IndexError) or into
+    # a node of the wrong type (an AttributeError), both are a ParseError
+    def _parse_blocks(self):
+        cursor = self.cursor
+        try:
+            while not cursor.at_end():
+                block = self._run(self._parse_block())
+                if block is not None:
+                    yield block
+                check_deadline(self.deadline)
+        except (IndexError, AttributeError) as error:
+            raise ParseError(f"Malformed markdown near token {cursor.index}: {error}") from error
+
+    def _parse(self):
+        try:
+            return list(self._parse_blocks())
+        except _CodeRead:
+            # The lexer took something for a code block that's parsed as markdown
+            # (ex: a fence right under a list item), parse it with the code lexed
+            # into tokens instead
+            self.tokens = expand_code(self.tokens)
+            self.cursor = Cursor(self.tokens)
+            self.depth = 0
+            return list(self._parse_blocks())
+
+# Raised when the code of a lexer.CodeToken is read anywhere but as a code
+# block's code. Only _parse_inline can, a CodeToken always follows a NEWLINE
+# and every other way of getting past one ends up parsing it as a paragraph.
+class _CodeRead(Exception):
+    pass
+
+# Parses tokens as they're produced, handing out each top level block as soon
+# as it's complete. Only the tokens of the block being parsed are kept around.
+class StreamingParser(Parser):
+    def __init__(self, tokens, limits=no_limits, deadline=None):
+        self.tokens = TokenStream(tokens)
+        self.cursor = StreamCursor(self.tokens)
+        self._limit(limits, deadline)
+        self.should_debug = False
+
+    def blocks(self):
+        for block in self._parse_blocks():
+            self.tokens.release(self.cursor.index)
+            yield block
@@ -0,0 +1,139 @@
+from mark.parser import (Node, Text, Header, Link, Image, CodeBlock, ListItem,
+                         TEXT, HEADER, LINK, IMAGE, CODEBLOCK, LIST_ITEM)
+from mark.errors import FormatError
+import marshal
+
+# A precompiled document is MAGIC, a version byte and a marshaled flat list
+# of its nodes in preorder. A Text node is just its value, any other node is
+# its kind, the number of children it has and then the fields of its type:
+#   HEADER: level    LINK: href    IMAGE: alt, path
+#   CODEBLOCK: lang  LIST_ITEM: indent, list kind
+# The version changes whenever the layout or the node kinds do, older data
+# has to be compiled from its source again.
+MAGIC = b"MARKAST"
+VERSION = 1
+_header = MAGIC + bytes([VERSION])
+
+def dumps(document: list) -> bytes:
+    flat = [len(document)]
+    append = flat.append
+    stack = [iter(document)]
+    while stack:
+        for node in stack[-1]:
+            kind = node.kind
+            if kind == TEXT:
+                append(node.value)
+                continue
+
+            append(kind)
+            append(len(node.children))
+            if kind == HEADER:
+                append(node.level)
+            elif kind == LINK:
+                append(node.href)
+            elif kind == IMAGE:
+                append(node.alt)
+                append(node.path)
+            elif kind == CODEBLOCK:
+                append(node.lang)
+            elif kind == LIST_ITEM:
+                append(node.indent)
+                append(node.list_kind)
+
+            if node.children:
+                stack.append(iter(node.children))
+                break
+        else:
+            stack.pop()
+    return _header + marshal.dumps(flat)
+
+# Returns the document dumps was given. Raises errors.FormatError (a
+# ValueError) if @data isn't a precompiled document of this version, or is
+# one that was damaged. That's only a check against mistakes: marshal isn't
+# safe against data made to attack it, so @data has to come from a trusted
+# source, ex: what the same site's build wrote.
+def loads(data) -> list:
+    data = memoryview(data)
+    if len(data) < len(_header) or data[:len(MAGIC)] != MAGIC:
+        raise FormatError("Not a precompiled markdown document.")
+    if data[len(MAGIC)] != VERSION:
+        raise FormatError(f"Precompiled document is version {data[len(MAGIC)]}, "
+                          f"expected version {VERSION}.")
+    try:
+        flat = marshal.loads(data[len(_header):])
+    except (EOFError, ValueError, TypeError, MemoryError) as error: # MemoryError: a damaged length
+        raise FormatError(f"Damaged precompiled document: {type(error).__name__}: {error}") from None
+    if flat.__class__ is not list:
+        raise FormatError("Damaged precompiled document: its nodes aren't a list.")
+    try:
+        return _rebuild(flat)
+    except StopIteration:
+        raise FormatError("Damaged precompiled document: it ends in the middle of a node.") from None
+    except (TypeError, IndexError) as error:
+        raise FormatError(f"Damaged precompiled document: {type(error).__name__}: {error}") from None
+
+_end = object()
+
+def _count(value) -> int:
+    if value.__class__ is not int or value < 0:
+        raise FormatError(f"Damaged precompiled document: {value!r} isn't a child count.")
+    return value
+
+# The nodes of the flat list dumps makes
+def _rebuild(flat: list) -> list:
+    values = iter(flat)
+    value = values.__next__
+    document = []
+    # (list the next nodes go into, how many more go into it)
+    stack = [(document, _count(value()))]
+    children, remaining = stack[-1]
+    while True:
+        while remaining == 0:
+            stack.pop()
+            if not stack:
+                if next(values, _end) is not _end:
+                    raise FormatError("Damaged precompiled document: data after the last node.")
+                return document
+            children, remaining = stack[-1]
+
+        kind = value()
+        if kind.__class__ is str:
+            children.append(Text(kind))
+            remaining -= 1
+            continue
+        # Text nodes are only ever strings, every other kind comes before TEXT
+        if kind.__class__ is not int or not 0 <= kind < TEXT:
+            raise FormatError(f"Damaged precompiled document: {kind!r} isn't a node kind.")
+
+        count = _count(value())
+        if kind == HEADER:
+            node = Header(value())
+        elif kind == LINK:
+            node = Link()
+            node.href = value()
+        elif kind == IMAGE:
+            if count:
+                raise FormatError("Damaged precompiled document: an image with children.")
+            node = Image(value(), value())
+        elif kind == CODEBLOCK:
+            node = CodeBlock(value())
+        elif kind == LIST_ITEM:
+            node = ListItem(value(), value())
+        else:
+            node = Node(kind)
+        children.append(node)
+
+        if count > 0:
+            stack[-1] = (children, remaining - 1)
+            children, remaining = node.children, count
+            stack.append((children, remaining))
+        else:
+            remaining -= 1
+
+def dump(document: list, filename: str) -> None:
+    with open(filename, "wb") as file:
+        file.write(dumps(document))
+
+def load(filename: str) -> list:
+    with open(filename, "rb") as file:
+        return loads(file.read())
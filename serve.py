@@ -0,0 +1,314 @@
+from mark.markdown import Markdown
+from mark.errors import MarkError, InputTooLarge, TooManyTokens, TimeLimitExceeded
+from mark.limits import Limits, untrusted
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+# Latencies and throughput of the requests a RenderService answered. Latency
+# percentiles are over the last @window requests.
+class ServiceStats:
+    def __init__(self, window: int = 10000):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.statuses = Counter()
+        self.inline = 0 # Compiled on the event loop
+        self.pooled = 0 # Compiled in the pool
+        self.rejected = 0 # Turned away because the queue was full
+        self.timeouts = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.recent = deque(maxlen=window) # (when it finished, seconds it took)
+
+    def record(self, status: int, seconds: float, bytes_in: int, bytes_out: int) -> None:
+        self.requests += 1
+        self.statuses[status] += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.recent.append((time.monotonic(), seconds))
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        latencies = sorted(seconds for _, seconds in self.recent)
+        # Throughput over the recent requests, or since the start if that's all there is
+        since = self.recent[0][0] if len(self.recent) == self.recent.maxlen else self.started
+        return {
+            "uptime": now - self.started,
+            "requests": self.requests,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "inline": self.inline, "pooled": self.pooled,
+            "rejected": self.rejected, "timeouts": self.timeouts,
+            "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+            "requests_per_second": len(latencies) / max(now - since, 1e-9),
+            "latency_ms": {name: _percentile(latencies, p) * 1000
+                           for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))},
+        }
+
+def _percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+# An HTTP error response, raised while handling a request
+class _Reply(Exception):
+    def __init__(self, status: int, message: str, headers: dict = None):
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+# Answers POST /compile (markdown in, html out) and GET /stats over HTTP/1.1.
+# Sources up to @inline_bytes are compiled right on the event loop, bigger
+# ones are sent to @pool (see worker_pool), at most @workers at a time. Up to
+# @queue_size more wait for a turn, past that requests get a 503 right away.
+# Every request has @timeout seconds from when its request line arrives to be
+# read and compiled, past that it gets a 504 (or the connection is closed if
+# it's still being sent) and lexing and parsing it stop, in the pool as well.
+# Connections idle for @timeout are closed.
+class RenderService:
+    def __init__(self, markdown: Markdown, pool, workers: int, queue_size: int = 64,
+                 timeout: float = 10.0, inline_bytes: int = 8192, max_bytes: int = None):
+        self.markdown = markdown
+        self.pool = pool
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.inline_bytes = inline_bytes
+        self.max_bytes = markdown.limits.max_size if max_bytes is None else max_bytes
+        self.slots = asyncio.Semaphore(workers)
+        self.waiting = 0 # For a slot in the pool
+        self.running = 0 # In the pool, until the worker is done even if the request timed out
+        self.stats = ServiceStats()
+
+    # Serves one connection, it's kept alive for as many requests as the client sends
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.timeout)
+                except (asyncio.TimeoutError, ConnectionError):
+                    return # Idle, or the client went away
+                except ValueError: # Longer than the reader's limit
+                    await self._respond(writer, 400, "Request line too long.", True, {},
+                                        time.perf_counter(), 0)
+                    return
+                if not line:
+                    return
+                # Waiting for the request isn't part of its latency or its time
+                start = time.perf_counter()
+                deadline = start + self.timeout
+                try:
+                    request = await asyncio.wait_for(self._read_request(line, reader), self.timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return # Sent too slowly, or the client went away
+                except _Reply as reply:
+                    await self._respond(writer, reply.status, reply.message, True, reply.headers, start, 0)
+                    return
+
+                method, path, body, keep_alive = request
+                status, content_type, content, headers = await self._answer(method, path, body, deadline)
+                close = not keep_alive or status == 413
+                await self._respond(writer, status, content, close, headers, start, len(body), content_type)
+                if close:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # @deadline: time.perf_counter() by which the html has to be ready
+    async def _answer(self, method: str, path: str, body: bytes, deadline: float) -> tuple:
+        path = path.split("?", 1)[0]
+        if path == "/stats":
+            if method != "GET":
+                return 405, "text/plain", "Use GET.", {"Allow": "GET"}
+            return 200, "application/json", json.dumps(self.snapshot()), {}
+        if path != "/compile":
+            return 404, "text/plain", "Not found, POST markdown to /compile.", {}
+        if method != "POST":
+            return 405, "text/plain", "Use POST.", {"Allow": "POST"}
+
+        try:
+            html = await asyncio.wait_for(self.compile(body, deadline),
+                                          max(0.0, deadline - time.perf_counter()))
+        except _Reply as reply:
+            return reply.status, "text/plain", reply.message, reply.headers
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            return 504, "text/plain", "Timed out compiling the markdown.", {}
+        except TimeLimitExceeded as error:
+            self.stats.timeouts += 1
+            return 504, "text/plain", str(error), {}
+        except (InputTooLarge, TooManyTokens) as error:
+            return 413, "text/plain", str(error), {}
+        except MarkError as error:
+            return 422, "text/plain", str(error), {}
+        except Exception as error:
+            return 500, "text/plain", f"{type(error).__name__}: {error}", {}
+        return 200, "text/html; charset=utf-8", html, {}
+
+    # Returns the html of @body, utf-8 markdown. Lexing and parsing give up at
+    # @deadline (a time.perf_counter()), in the pool as well.
+    async def compile(self, body: bytes, deadline: float) -> str:
+        try:
+            # Same newline handling as build
+            source = body.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        except UnicodeDecodeError:
+            raise _Reply(400, "The markdown isn't utf-8.")
+        if len(source) == 0:
+            return ""
+        if len(body) <= self.inline_bytes:
+            self.stats.inline += 1
+            return compile_within(self.markdown, source, deadline - time.perf_counter())
+
+        if self.waiting >= self.queue_size:
+            self.stats.rejected += 1
+            raise _Reply(503, "Too many documents queued, try again later.",
+                         headers={"Retry-After": "1"})
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        # The slot is held until the worker is done, a request that times out
+        # can't cancel a compile that's already running
+        try:
+            # What's left of the request's time once it has a worker, not the clock of
+            # the process it ends up in
+            seconds = deadline - time.perf_counter()
+            future = asyncio.get_running_loop().run_in_executor(
+                self.pool, compile_within, self.markdown, source, seconds)
+        except BaseException:
+            self.slots.release()
+            raise
+        self.running += 1
+        future.add_done_callback(self._done)
+        self.stats.pooled += 1
+        return await asyncio.shield(future)
+
+    def _done(self, future: asyncio.Future) -> None:
+        self.running -= 1
+        self.slots.release()
+        if not future.cancelled():
+            future.exception() # Retrieved, the request may have stopped waiting for it
+
+    def snapshot(self) -> dict:
+        stats = self.stats.snapshot()
+        stats["queued"] = self.waiting
+        stats["running"] = self.running
+        return stats
+
+    # Returns (method, path, body, keep alive) of the request that starts with
+    # @line, its request line
+    async def _read_request(self, line: bytes, reader: asyncio.StreamReader) -> tuple:
+        try:
+            method, path, version = line.decode("latin-1").split()
+        except ValueError:
+            raise _Reply(400, "Malformed request line.")
+
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError: # Longer than the reader's limit
+                raise _Reply(431, "Header line too long.")
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(line, None)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise _Reply(400, "Malformed Content-Length.")
+        if length < 0:
+            raise _Reply(400, "Malformed Content-Length.")
+        if self.max_bytes is not None and length > self.max_bytes:
+            raise _Reply(413, f"Markdown is larger than {self.max_bytes} bytes.")
+        body = await reader.readexactly(length)
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, path, body, keep_alive
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, content: str, close: bool,
+                       headers: dict, start: float, bytes_in: int,
+                       content_type: str = "text/plain") -> None:
+        content = content.encode("utf-8")
+        head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(content)}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        if close:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content)
+        # Backpressure, a client that doesn't read its responses doesn't get more
+        await writer.drain()
+        self.stats.record(status, time.perf_counter() - start, bytes_in, len(content))
+
+# @markdown's html of @source, lexing and parsing give up after @seconds if
+# @markdown's own limits don't have them give up sooner
+def compile_within(markdown: Markdown, source: str, seconds: float) -> str:
+    limits = markdown.limits
+    if limits.max_seconds is not None:
+        seconds = min(seconds, limits.max_seconds)
+    limits = Limits(limits.max_size, limits.max_tokens, limits.max_depth, max(0.0, seconds))
+    return Markdown(markdown.prettify, markdown.base_indent, limits, markdown.highlight).compile(source)
+
+# The pool a RenderService compiles in, worker processes or @threads
+def worker_pool(workers: int, threads: bool = False):
+    if threads:
+        return ThreadPoolExecutor(workers)
+    # Workers forked from the server would hold on to the connections it had
+    # open at the time, and keep them from ever closing
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+# Serves @service on @host:@port, or on the Unix socket at @unix if given,
+# until cancelled. @ready is called with the asyncio server once it's listening.
+async def serve(service: RenderService, host: str = "127.0.0.1", port: int = 8000,
+                unix: str = None, ready=None) -> None:
+    if unix is not None:
+        server = await asyncio.start_unix_server(service.handle, unix)
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+    async with server:
+        if ready is not None:
+            ready(server)
+        await server.serve_forever()
+
+def main(args) -> int:
+    # Lexing and parsing never take longer than a request has, see compile_within
+    limits = Limits(untrusted.max_size, untrusted.max_tokens, untrusted.max_depth, args.timeout)
+    if args.max_bytes is not None:
+        limits.max_size = args.max_bytes
+    markdown = Markdown(args.prettify, args.base_indent, limits, args.highlight)
+
+    workers = args.workers or os.cpu_count() or 1
+    pool = worker_pool(workers, args.threads)
+
+    def ready(server):
+        where = args.unix or "http://%s:%d" % server.sockets[0].getsockname()[:2]
+        print(f"serving on {where}, POST markdown to /compile, GET /stats", file=sys.stderr)
+
+    async def run():
+        service = RenderService(markdown, pool, workers, args.queue, args.timeout,
+                                args.inline_bytes, limits.max_size)
+        await serve(service, args.host, args.port, args.unix, ready)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return 0